@@ -0,0 +1,68 @@
+# encoding: utf-8
+
+"""Markdown converters micro-benchmark.
+
+Converts prototype website content with each converter, and compares
+timing and output with the plain markdown.markdown() call for each document.
+
+Usage: python benchmarks/bench_markdown.py [-n REPEAT] [ENGINE ...]
+
+ENGINE is a name from publicstatic.markdown.ENGINES, or a full name of
+a converter class. All registered engines are compared by default."""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+from publicstatic import markdown as pubmd
+from publicstatic import pathes
+from publicstatic.source import ParseableSource
+
+
+def documents():
+    """Markdown content of the prototype website pages and posts."""
+    result = []
+    pattern = os.path.join(pathes.proto(), '*', '*.md')
+    for file_name in sorted(glob.glob(pattern)):
+        with open(file_name, encoding='utf-8') as f:
+            result.append(ParseableSource._split(f.read())[2].strip())
+    return result
+
+
+def reference(text):
+    return markdown.markdown(text, extensions=pubmd.EXTENSIONS)
+
+
+def measure(convert, docs, repeat):
+    """Returns average conversion time per document (seconds)."""
+    timer = timeit.Timer(lambda: [convert(doc) for doc in docs])
+    return min(timer.repeat(3, repeat)) / (repeat * len(docs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='markdown benchmark')
+    parser.add_argument('engines', nargs='*', default=sorted(pubmd.ENGINES))
+    parser.add_argument('-n', dest='repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    docs = documents()
+    expected = [reference(doc) for doc in docs]
+    base = measure(reference, docs, args.repeat)
+    print("%-30s %10s %8s %s" % ('converter', 'ms/doc', 'speedup', 'output'))
+    print("%-30s %10.3f %8s %s" % ('markdown.markdown()', base * 1000,
+                                     '1.00x', 'reference'))
+    for name in args.engines:
+        convert = pubmd.load_engine(name)().convert
+        same = [convert(doc) for doc in docs] == expected
+        spent = measure(convert, docs, args.repeat)
+        print("%-30s %10.3f %7.2fx %s" % (name, spent * 1000, base / spent,
+                                           'same' if same else 'DIFFERENT'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# encoding: utf-8
+
+"""HTML minifier benchmark.
+
+Compares the tokenizer-based minifier with the previous implementation
+based on BeautifulSoup and html5lib (kept here for reference; requires
+beautifulsoup4 and html5lib packages).
+
+Usage: python benchmarks/bench_minify.py [-n REPEAT] [FILE ...]
+
+FILE is an HTML file to be minified (e.g. a page from the build
+directory). The test document from tests/test_minify.py is used
+by default."""
+
+import argparse
+import html
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+import bs4
+from publicstatic import minify
+import test_minify
+
+EXCLUDE_TAGS = ('pre', 'script', 'textarea')
+
+COND_RE = re.compile(r"<!--\[if .*\]>.*<!\[endif\]-->")
+
+SPACES_RE = re.compile(r"\s+")
+
+
+def legacy_minify_html(text, ignore_comments=True):
+    """Previous implementation parsing the document with html5lib twice."""
+    soup = bs4.BeautifulSoup(text, 'html5lib')
+    text = str(soup)
+    exclude_tags = {}
+
+    for tag in EXCLUDE_TAGS:
+        items = [str(e) for e in soup.findAll(name=tag) if len(e.text) > 0]
+        for index, elem in enumerate(items):
+            text = text.replace(elem, _tag(tag, index))
+        exclude_tags[tag] = items
+
+    soup = bs4.BeautifulSoup(text, 'html5lib')
+
+    if ignore_comments:
+        f = lambda text: isinstance(text, bs4.Comment) and not \
+                         COND_RE.match(text.output_ready())
+        for comment in soup.findAll(text=f):
+            comment.extract()
+
+    lines = str(soup).replace(' \n', ' ').split('\n')
+    minified_lines = []
+
+    for num, line in enumerate(lines):
+        line = line.strip()
+        if not _between(line, minified_lines, num):
+            line = ' ' + line
+        minified_lines.append(line)
+        if line.endswith('</a>') and not lines[num + 1].startswith('</body>'):
+            minified_lines.append(' ')
+
+    content = SPACES_RE.sub(' ', ''.join(minified_lines))
+
+    for tag in EXCLUDE_TAGS:
+        for num, e in enumerate(exclude_tags[tag]):
+            content = content.replace(_tag(tag, num), html.unescape(e))
+
+    return content
+
+
+def _between(current_line, all_lines, index):
+    return not current_line or \
+           current_line.startswith('<') or \
+           all_lines[index - 1].endswith('>')
+
+
+def _tag(tag, index):
+    return "<%s>%d</%s>" % (tag, index, tag)
+
+
+def documents(file_names):
+    if not file_names:
+        return [('test_minify.py', test_minify.test_html)]
+    result = []
+    for file_name in file_names:
+        with open(file_name, encoding='utf-8') as f:
+            result.append((os.path.basename(file_name), f.read()))
+    return result
+
+
+def measure(func, text, repeat):
+    """Returns average time per call (seconds)."""
+    timer = timeit.Timer(lambda: func(text))
+    return min(timer.repeat(3, repeat)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML minifier benchmark')
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-n', dest='repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print("%-30s %10s %10s %8s %s" % ('document', 'legacy ms', 'ms',
+                                        'speedup', 'output'))
+    for name, text in documents(args.files):
+        same = legacy_minify_html(text) == minify.minify_html(text)
+        legacy = measure(legacy_minify_html, text, args.repeat)
+        spent = measure(minify.minify_html, text, args.repeat)
+        print("%-30s %10.3f %10.3f %7.2fx %s" % (
+            name[:30], legacy * 1000, spent * 1000, legacy / spent,
+            'same' if same else 'different'))
+
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,9 @@ def dispatch(args):
     if command == 'init':
         publicstatic.init(args.get('path'), args['force'])
     elif command == 'build':
-        publicstatic.build(source, args['output'])
+        publicstatic.build(source, args['output'], args['jobs'])
+    elif command == 'watch':
+        publicstatic.watch(source, args['output'], args['jobs'])
     elif command == 'run':
         publicstatic.run(source, args['port'], args['browse'])
     elif command == 'deploy':
@@ -36,6 +38,16 @@ def dispatch(args):
         publicstatic.page(source, args['name'], args['force'], args['edit'])
     elif command == 'post':
         publicstatic.post(source, args['name'], args['force'], args['edit'])
+    elif command == 'cache':
+        subcommand = args.get('command2')
+        if subcommand == 'clear':
+            publicstatic.cache_clear(source)
+        elif subcommand == 'stats':
+            publicstatic.cache_stats(source)
+    elif command == 'templates':
+        subcommand = args.get('command2')
+        if subcommand == 'compile':
+            publicstatic.templates_compile(source)
     elif command == 'theme':
         subcommand = args.get('command2')
         if subcommand == 'update':
@@ -2,18 +2,42 @@
 
 """Website building routines."""
 
+from collections import OrderedDict
 import os
-import shutil
 import traceback
+from types import MappingProxyType
+from publicstatic import bundler
 from publicstatic import conf
 from publicstatic import const
+from publicstatic import cssmin
+from publicstatic import deps
 from publicstatic import logger
 from publicstatic import helpers
+from publicstatic import manifest
+from publicstatic import minify
+from publicstatic import output
+from publicstatic import parallel
 from publicstatic import templates
+from publicstatic.version import __version__
+
+_commons = None  # site-wide template variables shared by the current build
+
+
+def reset():
+    """Forget build-scoped data, so site-wide variables are computed once
+    again for the next build."""
+    global _commons
+    _commons = None
 
 
 def order():
     """Returns a sequence of builder functions."""
+    return asset_builders() + content_builders()
+
+
+def asset_builders():
+    """Builders processing assets. Each one handles only the assets
+    not processed yet."""
     return [
         css,
         js,
@@ -21,6 +45,13 @@ def order():
         robots,
         humans,
         static,
+        bundles,
+    ]
+
+
+def content_builders():
+    """Builders generating pages, posts and blog index pages."""
+    return [
         pages,
         posts,
         archive,
@@ -32,56 +63,81 @@ def order():
 
 def css(cache):
     """Minify CSS files to the build path."""
-    for source in cache.assets(ext='.css'):
-        helpers.makedirs(source.dest_dir())
-        command = conf.get('min_css_cmd')
-        if conf.get('min_css') and command:
-            logger.info('minifying CSS: ' + source.rel_path())
-            helpers.execute(command, source.path(), source.dest())
-        else:
-            logger.info('copying: ' + source.rel_path())
-            shutil.copyfile(source.path(), source.dest())
-        helpers.utime(source.dest(), source.updated())
-        source.processed(True)
+    command = conf.get('min_css_cmd')
+    if conf.get('min_css') and conf.get('min_css_engine') == 'builtin':
+        _minify(cache.assets(ext='.css', processed=False),
+                cssmin.minify_css, 'minifying CSS')
+    elif conf.get('min_css') and command:
+        def steps(source, dest):
+            return [('minifying CSS', command, source.path(), dest)]
+
+        def key(source):
+            return minify.command_key(command, source.path())
+        _execute(cache.assets(ext='.css', processed=False), steps, key)
+    else:
+        _copy(cache.assets(ext='.css', processed=False))
 
 
 def js(cache):
     """Minify JavaScript files to the build path."""
-    for source in cache.assets(ext='.js'):
-        helpers.makedirs(source.dest_dir())
-        command = conf.get('min_js_cmd')
-        if conf.get('min_js') and command:
-            logger.info('minifying JavaScript: ' + source.rel_path())
-            helpers.execute(command, source.path(), source.dest())
-        else:
-            logger.info('copying: ' + source.rel_path())
-            shutil.copyfile(source.path(), source.dest())
-        helpers.utime(source.dest(), source.updated())
-        source.processed(True)
+    command = conf.get('min_js_cmd')
+    batch_cmd = conf.get('min_js_batch_cmd')
+    if conf.get('min_js') and batch_cmd:
+        def key(source):
+            return minify.command_key(batch_cmd, source.path())
+        _execute_batch(cache.assets(ext='.js', processed=False),
+                       'minifying JavaScript', batch_cmd, key)
+    elif conf.get('min_js') and command:
+        def steps(source, dest):
+            return [('minifying JavaScript', command, source.path(), dest)]
+
+        def key(source):
+            return minify.command_key(command, source.path())
+        _execute(cache.assets(ext='.js', processed=False), steps, key)
+    else:
+        _copy(cache.assets(ext='.js', processed=False))
 
 
 def less(cache):
     """Compile and minify less files."""
-    for source in cache.assets(ext='.less'):
-        helpers.makedirs(source.dest_dir())
-        logger.info('compiling LESS: ' + source.rel_path())
-        if conf.get('min_css') and conf.get('min_css_cmd'):
-            tmp_file = os.path.join(source.dest_dir(), '_' + source.basename())
-            helpers.execute(conf.get('less_cmd'), source.path(), tmp_file)
-            logger.info('minifying CSS: ' + source.rel_path())
-            helpers.execute(conf.get('min_css_cmd'), tmp_file, source.dest())
-            os.remove(tmp_file)
-        else:
-            helpers.execute(conf.get('less_cmd'), source.path(), source.dest())
-        helpers.utime(source.dest(), source.updated())
-        source.processed(True)
+    less_cmd = conf.get('less_cmd')
+    min_cmd = conf.get('min_css_cmd')
+    builtin = conf.get('min_css') and conf.get('min_css_engine') == 'builtin'
+    compress = conf.get('min_css') and min_cmd and not builtin
+
+    def tmp_file(source):
+        return os.path.join(source.dest_dir(), '_' + source.basename())
+
+    def steps(source, dest):
+        if not compress:
+            return [('compiling LESS', less_cmd, source.path(), dest)]
+        return [
+            ('compiling LESS', less_cmd, source.path(), tmp_file(source)),
+            ('minifying CSS', min_cmd, tmp_file(source), dest),
+        ]
+
+    sources = list(cache.assets(ext='.less', processed=False))
+    # sources could import each other, so all of them are hashed (once)
+    imports = sorted(item.path() for item in cache.assets(ext='.less'))
+    imports_key = minify.command_key(None, *imports) if sources else None
+    commands = [less_cmd, min_cmd if compress else None,
+                __version__ if builtin else None, imports_key]
+
+    def key(source):
+        return minify.command_key(commands + [source.path()])
+
+    _execute(sources, steps, key, cssmin.minify_css if builtin else None)
+    if compress:
+        for source in sources:
+            if os.path.isfile(tmp_file(source)):
+                os.remove(tmp_file(source))
 
 
 def robots(cache):
     """Build robots.txt."""
-    for source in cache.assets(basename='robots.txt'):
+    for source in cache.assets(basename='robots.txt', processed=False):
         logger.info('processing ' + source.rel_path())
-        helpers.makedirs(source.dest_dir())
+        output.makedirs(source.dest_dir())
         try:
             data = _complement({})
             templates.render_file(source.path(), data, source.dest())
@@ -94,9 +150,9 @@ def robots(cache):
 
 def humans(cache):
     """Build humans.txt."""
-    for source in cache.assets(basename='humans.txt'):
+    for source in cache.assets(basename='humans.txt', processed=False):
         logger.info('processing ' + source.rel_path())
-        helpers.makedirs(source.dest_dir())
+        output.makedirs(source.dest_dir())
         try:
             data = _complement({})
             templates.render_file(source.path(), data, source.dest())
@@ -109,38 +165,33 @@ def humans(cache):
 
 def static(cache):
     """Copy other assets as is to the build path."""
-    for source in cache.assets(processed=False):
-        logger.info('copying: ' + source.rel_path())
-        helpers.makedirs(source.dest_dir())
-        shutil.copyfile(source.path(), source.dest())
-        helpers.utime(source.dest(), source.updated())
-        source.processed(True)
+    _copy(list(cache.assets(processed=False)))
 
 
-def pages(cache):
-    """Build site pages."""
-    for source in cache.pages():
-        logger.info(_to('page', source.rel_path(), source.rel_dest()))
-        helpers.makedirs(source.dest_dir())
+def bundles(cache):
+    """Build asset bundles (see bundler module)."""
+    for name in bundler.names():
+        logger.info('bundle: ' + name)
+        dest = os.path.join(conf.get('build_path'), name)
         try:
-            data = _complement(source.data(), index=cache.index())
-            templates.render_page(data, source.dest())
+            text = bundler.build(name)
+            output.makedirs(os.path.dirname(dest))
+            with output.label(name):
+                output.write(dest, text)
         except Exception as ex:
-            logger.error('page building error: ' + str(ex))
+            logger.error("bundle '%s' failed: %s" % (name, ex))
             logger.debug(traceback.format_exc())
 
 
+def pages(cache):
+    """Build site pages."""
+    index_digest = helpers.digest(*[post.digest() for post in cache.posts()])
+    _render_sources('page', cache.pages(), cache.index(), index_digest)
+
+
 def posts(cache):
     """Build blog posts and copy the latest post to the site root."""
-    for source in cache.posts():
-        logger.info(_to('post', source.rel_path(), source.rel_dest()))
-        helpers.makedirs(source.dest_dir())
-        try:
-            data = _complement(source.data())
-            templates.render_page(data, source.dest())
-        except Exception as ex:
-            logger.error('post building error: ' + str(ex))
-            logger.debug(traceback.format_exc())
+    _render_sources('post', cache.posts())
 
     if conf.get('post_at_root_url'):  # put the latest post at site root url
         last = cache.posts()[0]
@@ -148,8 +199,9 @@ def posts(cache):
         logger.info(_to('root', last.rel_dest(), conf.get('index_page')))
         if any(cache.pages(dest=conf.get('index_page'))):
             logger.warn('root page will be overwritten by the latest post')
+        output.flush()  # the latest post should be written first
         try:
-            shutil.copyfile(last.dest(), path)
+            output.copy(last.dest(), path)
         except FileNotFoundError:
             logger.error("latest post was not generated and can't be copied")
 
@@ -158,7 +210,7 @@ def archive(cache):
     """Build blog archive page."""
     dest = os.path.join(conf.get('build_path'), conf.get('archive_location'))
     logger.info('archive: ' + conf.get('archive_location'))
-    helpers.makedirs(os.path.dirname(dest))
+    output.makedirs(os.path.dirname(dest))
     page_data = {'title': 'Archive', 'tags': cache.tags()}
     data = _complement(page_data, index=cache.index())
     templates.render(data, 'archive.html', dest)
@@ -170,7 +222,7 @@ def tags(cache):
         tag = tag['name']
         dest = helpers.tag_path(tag)
         logger.info(_to('tag', tag, dest))
-        helpers.makedirs(os.path.dirname(dest))
+        output.makedirs(os.path.dirname(dest))
         data = _complement({'title': tag}, index=cache.index(tag=tag))
         templates.render(data, 'tag.html', dest)
 
@@ -180,7 +232,7 @@ def atom(cache):
     data = _complement(index=cache.index())
     dest = os.path.join(conf.get('build_path'), conf.get('atom_location'))
     logger.info(_to('atom feed', dest))
-    helpers.makedirs(os.path.dirname(dest))
+    output.makedirs(os.path.dirname(dest))
     templates.render(data, 'atom.xml', dest)
 
 
@@ -189,19 +241,274 @@ def sitemap(cache):
     data = _complement(index=cache.full_index())
     dest = os.path.join(conf.get('build_path'), const.SITEMAP)
     logger.info(_to('sitemap', dest))
-    helpers.makedirs(os.path.dirname(dest))
+    output.makedirs(os.path.dirname(dest))
     templates.render(data, 'sitemap.xml', dest)
 
 
+def _copy(sources):
+    """Copy asset files to the build path as is."""
+    for source in sources:
+        logger.info('copying: ' + source.rel_path())
+        output.makedirs(source.dest_dir())
+        if output.copy(source.path(), source.dest()):
+            helpers.utime(source.dest(), source.updated())
+        source.processed(True)
+
+
+def _unique_dests(sources):
+    """Returns a list of sources with distinct destinations, to be processed
+    concurrently. If a theme asset and a site asset share a destination,
+    the latter one is kept (as it would overwrite the former one being
+    processed sequentially), and the other one is marked as processed."""
+    result = OrderedDict()
+    for source in sources:
+        dest = source.rel_dest()
+        if dest in result:
+            result.pop(dest).processed(True)
+        result[dest] = source
+    return list(result.values())
+
+
+def _execute(sources, steps, key=None, transform=None):
+    """Process asset files with external commands running in a bounded
+    pool of threads. @steps is a function taking a source and a path to
+    write the result to, and returning a list of (message, command, source
+    path, destination path) tuples. Steps are executed sequentially until
+    the first failure. Optional @transform function is applied to the
+    text produced by the commands. Destination file is replaced only if
+    the result differs from it. Optional @key function returns
+    minification cache key for a source; cached results are used instead
+    of running the commands."""
+    sources = _unique_dests(sources)
+    for source in sources:
+        output.makedirs(source.dest_dir())
+
+    def process(source):
+        tmp_path = output.tmp_path(source.dest())
+        cache_key = key(source) if key else None
+        result = minify.cache().get(cache_key) if cache_key else None
+        if result is not None:
+            logger.info("using cached result: " + source.rel_path())
+            with open(tmp_path, mode='w', encoding='utf-8', newline='') as f:
+                f.write(result)
+            error = None
+        else:
+            error = run_steps(source, tmp_path)
+            if error is None and transform:
+                error = run_transform(source, tmp_path)
+            if error is None and cache_key:
+                _cache_result(cache_key, tmp_path)
+        if error is None:
+            if output.commit(tmp_path, source.dest()):
+                helpers.utime(source.dest(), source.updated())
+        elif os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        return error
+
+    def run_steps(source, tmp_path):
+        for message, command, src_path, dest_path in steps(source, tmp_path):
+            logger.info("%s: %s" % (message, source.rel_path()))
+            code, stdout, stderr = helpers.run(command, src_path, dest_path)
+            output = '\n'.join(filter(None, [stdout.strip(), stderr.strip()]))
+            if code != 0:
+                return "%s failed for '%s' (exit code %d)%s" % (
+                    message, source.rel_path(), code,
+                    (":\n" + output) if output else '')
+            if output:
+                logger.debug("%s output for '%s':\n%s" % (
+                    message, source.rel_path(), output))
+
+    def run_transform(source, tmp_path):
+        try:
+            with open(tmp_path, mode='r', encoding='utf-8') as f:
+                text = transform(f.read())
+            with open(tmp_path, mode='w', encoding='utf-8') as f:
+                f.write(text)
+        except Exception as ex:
+            logger.debug(traceback.format_exc())
+            return "processing failed for '%s': %s" % (source.rel_path(), ex)
+
+    count = parallel.jobs('command_jobs')
+    errors = parallel.threads(process, sources, count)
+    for source, error in zip(sources, errors):
+        if error is not None:
+            logger.error(error)
+        source.processed(True)
+
+
+def _execute_batch(sources, message, command, key=None):
+    """Process asset files with an external command taking many files per
+    run (see helpers.run_batch). Files are split into chunks of
+    min_js_batch_size, running in a bounded pool of threads. If a chunk
+    fails, its files are processed one by one to find the failing ones.
+    Optional @key function returns minification cache key for a source;
+    cached results are used instead of running the command."""
+    pending = []
+    for source in _unique_dests(sources):
+        output.makedirs(source.dest_dir())
+        cache_key = key(source) if key else None
+        result = minify.cache().get(cache_key) if cache_key else None
+        if result is None:
+            pending.append((source, cache_key))
+            continue
+        logger.info("using cached result: " + source.rel_path())
+        with output.label(source.rel_path()):
+            output.write(source.dest(), result, mtime=source.updated())
+        source.processed(True)
+
+    def process(chunk):
+        error = run(chunk)
+        if error is None or len(chunk) == 1:
+            return [error] * len(chunk)
+        logger.warn("%s failed for %d files, processing them one by one" % (
+            message, len(chunk)))
+        logger.debug(error)
+        return [run([item]) for item in chunk]
+
+    def run(chunk):
+        pairs = [(source.path(), output.tmp_path(source.dest()))
+                 for source, _ in chunk]
+        names = ', '.join(source.rel_path() for source, _ in chunk)
+        logger.info("%s: %s" % (message, names))
+        code, stdout, stderr = helpers.run_batch(command, pairs)
+        text = '\n'.join(filter(None, [stdout.strip(), stderr.strip()]))
+        if code != 0 or not all(os.path.isfile(tmp) for _, tmp in pairs):
+            for _, tmp in pairs:
+                if os.path.isfile(tmp):
+                    os.remove(tmp)
+            return "%s failed for '%s' (exit code %d)%s" % (
+                message, names, code, (":\n" + text) if text else '')
+        if text:
+            logger.debug("%s output for '%s':\n%s" % (message, names, text))
+        for (source, cache_key), (_, tmp) in zip(chunk, pairs):
+            if cache_key:
+                _cache_result(cache_key, tmp)
+            if output.commit(tmp, source.dest()):
+                helpers.utime(source.dest(), source.updated())
+
+    size = max(1, conf.get('min_js_batch_size'))
+    chunks = [pending[pos:pos + size] for pos in range(0, len(pending), size)]
+    count = parallel.jobs('command_jobs')
+    results = parallel.threads(process, chunks, count)
+    for chunk, errors in zip(chunks, results):
+        for (source, _), error in zip(chunk, errors):
+            if error is not None:
+                logger.error(error)
+            source.processed(True)
+
+
+def _minify(sources, func, message):
+    """Minify asset files in-process with @func taking and returning
+    the file contents."""
+    for source in sources:
+        logger.info("%s: %s" % (message, source.rel_path()))
+        output.makedirs(source.dest_dir())
+        try:
+            with open(source.path(), mode='r', encoding='utf-8') as f:
+                text = func(f.read())
+            with output.label(source.rel_path()):
+                output.write(source.dest(), text, mtime=source.updated())
+        except Exception as ex:
+            logger.error("%s failed for '%s': %s" % (
+                message, source.rel_path(), ex))
+            logger.debug(traceback.format_exc())
+        finally:
+            source.processed(True)
+
+
+def _cache_result(key, path):
+    """Put the contents of a text file to the minification cache."""
+    try:
+        with open(path, mode='r', encoding='utf-8', newline='') as f:
+            minify.cache().put(key, f.read())
+    except (UnicodeDecodeError, IOError, OSError) as ex:
+        logger.debug("result was not cached: " + str(ex))
+
+
+def _render_sources(subj, sources, index=None, extra=None):
+    """Render pages or posts skipping the ones unchanged since the previous
+    build. Rendering is spread across worker processes, if configured;
+    @index is shipped to each worker once."""
+    queue = []
+    skipped = 0
+    for source in sources:
+        if manifest.changed(source, extra):
+            queue.append(source)
+        else:
+            skipped += 1
+
+    output.flush()  # writer threads should be idle while forking workers
+    shared = (dict(_common_vars()), index)
+    streaming = conf.get('streaming')
+    limit = conf.get('stream_window') if streaming else None
+    results = parallel.imap(_render_page, queue, shared=shared, limit=limit)
+    for source, (found, state, counts, error) in zip(queue, results):
+        logger.info(_to(subj, source.rel_path(), source.rel_dest()))
+        output.add(counts['changed'], counts['unchanged'])
+        source.restore_content(state)
+        if error is None:
+            found.update(source.dependencies())
+            manifest.update(source, [source.rel_dest()], found, extra)
+        else:
+            message, trace = error
+            logger.error("%s building error: %s" % (subj, message))
+            logger.debug(trace)
+        if streaming:
+            source.release_content()
+
+    if skipped:
+        logger.info("%ss: %d unchanged, skipped" % (subj, skipped))
+
+
+def _render_page(source):
+    """Render a single page or post (executed by a worker process).
+    Returns a set of dependencies recorded while rendering, converted
+    content state, written files counts (see output module), and None
+    on success or error message and traceback otherwise."""
+    global _commons
+    commons, index = parallel.shared()
+    if _commons is None:  # worker process receives a copy from the parent
+        _commons = MappingProxyType(commons)
+    with deps.collect() as found, output.collect() as counts, \
+            output.label(source.rel_path()):
+        try:
+            output.makedirs(source.dest_dir())
+            data = _complement(source.data(), index=index)
+            templates.render_page(data, source.dest())
+        except Exception as ex:
+            error = str(ex), traceback.format_exc()
+            return found, _content_state(source), counts, error
+    return found, _content_state(source), counts, None
+
+
+def _content_state(source):
+    """Converted content state to be passed back from a worker. Content
+    is not kept in streaming mode, and only dependencies are returned."""
+    streaming = conf.get('streaming')
+    state = source.content_state(with_content=not streaming)
+    if streaming:
+        source.release_content()
+    return state
+
+
 def _complement(page_data=None, index=None):
-    """Complement individual page data with common variables and site index."""
+    """Complement individual page data with common variables and site index.
+    Both are shared by all pages and should not be modified."""
     return {
-        'commons': conf.commons(),
+        'commons': _common_vars(),
         'page': page_data,
-        'index': index if index is not None else [],
+        'index': index if index is not None else (),
     }
 
 
+def _common_vars():
+    """Read-only site-wide variables computed once per build."""
+    global _commons
+    if _commons is None:
+        _commons = MappingProxyType(conf.commons())
+    return _commons
+
+
 def _rel(path):
     build_path = conf.get('build_path')
     use_rel = path.startswith(build_path)
@@ -0,0 +1,180 @@
+# coding: utf-8
+
+"""Asset bundles.
+
+A bundle is a CSS or JavaScript file concatenated from the assets listed
+in the 'bundles' configuration parameter (bundle paths are relative to
+the build directory, asset paths are relative to the assets directory):
+
+    bundles:
+      css/site.css: [css/base.css, css/publicstatic.css]
+      js/site.js: [js/plugins.js, js/main.js]
+
+Local CSS @import rules are replaced with the imported files contents,
+and relative url() values are rewritten for the bundle location. Bundles
+are minified once, if minification is enabled for their type."""
+
+import os
+import posixpath
+import re
+import tempfile
+from publicstatic import conf
+from publicstatic import cssmin
+from publicstatic import errors
+from publicstatic import helpers
+from publicstatic import logger
+from publicstatic import minify
+from publicstatic import pathes
+
+# comments and strings are matched to be kept as is
+CSS_RE = re.compile(r"""(?P<comment>/\*.*?\*/)"""
+                    r"""|(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+                    r"""|@import\s+(?:url\(\s*(?P<q1>["']?)(?P<i1>[^"')]+)"""
+                    r"""(?P=q1)\s*\)|(?P<q2>["'])(?P<i2>[^"']+)(?P=q2))"""
+                    r"""\s*(?P<media>[^;]*);[ \t]*\n?"""
+                    r"""|url\(\s*(?P<q3>["']?)(?P<url>[^"')]+)(?P=q3)\s*\)"""
+                    r"""|@charset\s+[^;]*;[ \t]*\n?""", re.S | re.I)
+
+# absolute URLs, including protocol-relative and data URIs
+ABSOLUTE_RE = re.compile(r"^(?:[a-z][\w+.-]*:|/|#)", re.I)
+
+
+class AssetNotFoundException(errors.BasicException):
+    """bundled asset not found"""
+    pass
+
+
+class MinificationException(errors.BasicException):
+    """bundle minification failed"""
+    pass
+
+
+def names():
+    """Returns a sorted list of configured bundle names."""
+    return sorted(conf.get('bundles'))
+
+
+def url(name):
+    """Returns relative URL of the bundle (used by templates)."""
+    if name not in conf.get('bundles'):
+        raise ValueError("bundle is not configured: '%s'" % name)
+    return conf.get('rel_root_url') + name
+
+
+def build(name):
+    """Returns the contents of the bundle."""
+    if posixpath.isabs(name) or posixpath.normpath(name).startswith('..'):
+        raise ValueError("bundle path is outside build directory: '%s'" %
+                         name)
+    rel_paths = conf.get('bundles')[name]
+    if helpers.ext(name) == '.css':
+        text = concat_css(rel_paths, posixpath.dirname(name), _read)
+        if not conf.get('min_css'):
+            return text
+        if conf.get('min_css_engine') == 'builtin':
+            return cssmin.minify_css(text)
+        command = conf.get('min_css_cmd')
+        return _minify(text, '.css', command) if command else text
+    elif helpers.ext(name) == '.js':
+        text = concat_js(rel_paths, _read)
+        if not conf.get('min_js'):
+            return text
+        batch_cmd = conf.get('min_js_batch_cmd')
+        command = batch_cmd or conf.get('min_js_cmd')
+        return _minify(text, '.js', command, bool(batch_cmd)) \
+            if command else text
+    raise ValueError("unsupported bundle type: '%s'" % name)
+
+
+def concat_js(rel_paths, read):
+    """Concatenate JavaScript files. @read is a function returning the
+    contents of an asset file by its relative path."""
+    return '\n;\n'.join(read(rel_path).rstrip() for rel_path in rel_paths)
+
+
+def concat_css(rel_paths, bundle_dir, read):
+    """Concatenate CSS files inlining local @import rules, and rebasing
+    relative URLs to @bundle_dir. @read is a function returning the
+    contents of an asset file by its relative path. Imports of external
+    stylesheets are moved to the beginning of the result."""
+    imports = []
+    parts = [_inline(rel_path, bundle_dir, read, [], imports)
+             for rel_path in rel_paths]
+    return '\n'.join(imports + parts)
+
+
+def _inline(rel_path, bundle_dir, read, stack, imports):
+    """Returns CSS file contents with local imports inlined. @stack is the
+    list of files being inlined, used to break circular imports."""
+    if rel_path in stack:
+        logger.warn("circular CSS import ignored: " +
+                    ' -> '.join(stack + [rel_path]))
+        return ''
+    base_dir = posixpath.dirname(rel_path)
+
+    def replace(match):
+        if match.group('comment') or match.group('string'):
+            return match.group(0)
+        if match.group('url'):
+            return "url(%s%s%s)" % (match.group('q3'),
+                                    _rebase(match.group('url'), base_dir,
+                                            bundle_dir),
+                                    match.group('q3'))
+        ref = match.group('i1') or match.group('i2')
+        if ref is None:  # @charset
+            return ''
+        media = match.group('media').strip()
+        if ABSOLUTE_RE.match(ref):
+            imports.append(match.group(0).strip())
+            return ''
+        target = posixpath.normpath(posixpath.join(base_dir,
+                                                   re.split('[?#]', ref)[0]))
+        text = _inline(target, bundle_dir, read, stack + [rel_path], imports)
+        return "@media %s{\n%s}\n" % (media, text) if media else text
+
+    return CSS_RE.sub(replace, read(rel_path))
+
+
+def _rebase(value, base_dir, bundle_dir):
+    """Rewrite URL relative to @base_dir to be relative to @bundle_dir."""
+    if base_dir == bundle_dir or ABSOLUTE_RE.match(value):
+        return value
+    path, suffix = re.match(r"([^?#]*)(.*)", value).groups()
+    target = posixpath.normpath(posixpath.join(base_dir, path))
+    return posixpath.relpath(target, bundle_dir or '.') + suffix
+
+
+def _read(rel_path):
+    """Read an asset file from the site or theme assets directory."""
+    for path in [pathes.assets(rel_path), pathes.theme_assets(rel_path)]:
+        if os.path.isfile(path):
+            with open(path, mode='r', encoding='utf-8') as f:
+                return f.read()
+    raise AssetNotFoundException(path=rel_path)
+
+
+def _minify(text, ext, command, batch=False):
+    """Minify bundle contents with an external command, reusing cached
+    results for the same input."""
+    key = helpers.digest(command, text) if conf.get('min_cache_size') \
+        else None
+    result = minify.cache().get(key) if key else None
+    if result is not None:
+        return result
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, 'bundle' + ext)
+        dest = os.path.join(tmp_dir, 'bundle.min' + ext)
+        with open(source, mode='w', encoding='utf-8') as f:
+            f.write(text)
+        if batch:
+            code, stdout, stderr = helpers.run_batch(command, [(source, dest)])
+        else:
+            code, stdout, stderr = helpers.run(command, source, dest)
+        if code != 0 or not os.path.isfile(dest):
+            message = stderr.strip() or stdout.strip()
+            raise MinificationException(code=code, output=message)
+        with open(dest, mode='r', encoding='utf-8') as f:
+            result = f.read()
+    if key:
+        minify.cache().put(key, result)
+    return result
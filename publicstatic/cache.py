@@ -3,88 +3,167 @@
 import os
 from publicstatic import conf
 from publicstatic import helpers
+from publicstatic import manifest
+from publicstatic import parallel
 from publicstatic import pathes
+from publicstatic import scanner
 from publicstatic import source
 
 
 class Cache():
-    """Website contents cache."""
+    """Website contents cache. Sources are indexed by type, base classes,
+    extension, base name, relative destination and processed state;
+    a lookup costs proportionally to the size of the result instead of
+    the whole site."""
+
+    # index name -> function returning indexed value for a source
+    INDEXES = {
+        'type': type,
+        'ext': lambda item: item.ext(),
+        'basename': lambda item: item.basename(),
+        'dest': lambda item: item.rel_dest(),
+        'processed': lambda item: item.processed(),
+    }
 
     def __init__(self):
-        """Populate cache with source files."""
-        self._cache = []
-
-        proc_queue = [
+        """Populate cache with source files. Pages and posts are read and
+        parsed by worker processes, if configured."""
+        self._items = {}  # sequence number -> source
+        self._numbers = {}  # source path -> sequence number
+        self._index = {}  # (index name, value) -> {sequence number: source}
+        self._counter = 0
+        self._errors = []
+        jobs = []
+        for src_type, dir_path in Cache._dirs():
+            for entry in scanner.scan(dir_path, conf.get('ignore')):
+                jobs.append((src_type, dir_path, entry.rel_path, entry.stat))
+        parseable = [job for job in jobs
+                     if issubclass(job[0], source.ParseableSource)]
+        results = parallel.imap(_load, parseable)
+        for job in jobs:
+            if issubclass(job[0], source.ParseableSource):
+                self._add(job, next(results))
+            else:
+                self._add(job)
+
+    @staticmethod
+    def _dirs():
+        """Source types and root directories, in processing order."""
+        return [
             (source.AssetSource, pathes.theme_assets()),
             (source.AssetSource, pathes.assets()),
             (source.PageSource, pathes.pages()),
             (source.PostSource, pathes.posts()),
         ]
 
-        self._errors = []
-        for src_type, dir_path in proc_queue:
-            def add_source(root, rel):
-                try:
-                    file_name = os.path.join(root, rel)
-                    self._cache.append(src_type(file_name, root))
-                except Exception as e:
-                    self._errors.append((rel, e))
-
-            helpers.walk(dir_path, add_source)
-
-    def cond(self,
-             source_type=None,
-             is_inst=None,
-             ext=None,
-             processed=None,
-             basename=None,
-             dest=None,
-             tag=None):
-        """Creates source file filter function."""
-        conditions = []
-
-        if source_type is not None:
-            conditions.append(lambda source: source_type == type(source))
-
-        if is_inst is not None:
-            conditions.append(lambda source: isinstance(source, is_inst))
-
-        if ext is not None:
-            conditions.append(lambda source: ext == source.ext())
-
-        if processed is not None:
-            conditions.append(lambda source: processed == source.processed())
-
-        if basename is not None:
-            conditions.append(lambda source: basename == source.basename())
-
-        if dest is not None:
-            conditions.append(lambda source: dest == source.rel_dest())
-
-        if tag is not None:
-            tagged = lambda source: isinstance(source, source.ParseableSource)
-            hastag = lambda source: tagged(source) and source.has_tag(tag)
-            conditions.append(lambda source: hastag(source))
-
-        def _condition(source):
-            return all([cond(source) for cond in conditions])
-
-        return _condition
+    def _add(self, job, result=None, number=None):
+        """Add source to the cache. @job is a tuple of source type, root
+        directory, relative path and optional stat result; @result is
+        the value returned by _load() for the job, if already loaded.
+        Sequence @number defines source position; new sources are added
+        to the end."""
+        item, error = result or _load(job)
+        if error is not None:
+            self._errors.append((job[2], error))
+            return
+        if number is None:
+            number = self._counter
+            self._counter += 1
+        self._items[number] = item
+        self._numbers[item.path()] = number
+        for name, value in self._values(item):
+            self._index.setdefault((name, value), {})[number] = item
+        item.listen(self._reindex)
+
+    def _remove(self, file_name):
+        """Remove source from the cache. Returns its sequence number,
+        or None if there was no such source."""
+        number = self._numbers.pop(file_name, None)
+        if number is not None:
+            item = self._items.pop(number)
+            item.listen(None)
+            for key in self._values(item):
+                self._index[key].pop(number, None)
+        return number
+
+    def _values(self, item):
+        values = [(name, func(item)) for name, func in Cache.INDEXES.items()]
+        # each source class is indexed under its base classes as well
+        values += [('class', cls) for cls in type(item).__mro__
+                   if issubclass(cls, source.Source)]
+        return values
+
+    def _reindex(self, item):
+        """Update processed state index after source flag change."""
+        number = self._numbers[item.path()]
+        processed = item.processed()
+        self._index.get(('processed', not processed), {}).pop(number, None)
+        self._index.setdefault(('processed', processed), {})[number] = item
+
+    def _find(self, classes=None, **criteria):
+        """Get sources matching all the specified criteria (index name
+        and value pairs; None values are ignored) in processing order.
+        @classes is an optional base class to filter source types."""
+        buckets = [self._index.get(key, {})
+                   for key in criteria.items() if key[1] is not None]
+        if classes is not None:
+            buckets.append(self._index.get(('class', classes), {}))
+        if not buckets:
+            return [self._items[number] for number in sorted(self._items)]
+        buckets.sort(key=len)
+        smallest, rest = buckets[0], buckets[1:]
+        numbers = [number for number in smallest
+                   if all(number in bucket for bucket in rest)]
+        return [smallest[number] for number in sorted(numbers)]
+
+    def refresh(self, file_names):
+        """Update cache after source files creation, modification or removal.
+        Returns a set of affected source types."""
+        affected = set()
+        for file_name in file_names:
+            for src_type, root in Cache._dirs():
+                if helpers.within(file_name, root):
+                    break
+            else:
+                continue
+            rel = os.path.relpath(file_name, root)
+            number = self._remove(file_name)
+            self._errors = [error for error in self._errors if error[0] != rel]
+            ignored = scanner.ignored(rel, conf.get('ignore'))
+            if os.path.isfile(file_name) and not ignored:
+                self._add((src_type, root, rel, None), number=number)
+            affected.add(src_type)
+        if affected:
+            for attr in ['_posts', '_tags', '_post_index']:
+                if hasattr(self, attr):
+                    delattr(self, attr)
+        return affected
+
+    def dependents(self, key):
+        """Get parseable sources depending on the specified dependency
+        (see deps module). Besides the dependencies recorded while
+        converting content in the current process, the ones recorded
+        by the build manifest are used, since sources skipped by an
+        incremental build are not converted."""
+        recorded = set(manifest.dependents(key))
+        return [item for item in self._find(classes=source.ParseableSource)
+                if key in item.dependencies() or item.path() in recorded]
 
     def assets(self,
                ext=None,
                processed=None,
-               basename=None):
+               basename=None,
+               dest=None):
         """Get assets."""
-        condition = self.cond(source.AssetSource,
-                              ext=ext,
-                              processed=processed,
-                              basename=basename)
-        return filter(condition, self._cache)
+        return self._find(type=source.AssetSource,
+                          ext=ext,
+                          processed=processed,
+                          basename=basename,
+                          dest=dest)
 
     def pages(self, dest=None):
         """Get pages."""
-        return filter(self.cond(source.PageSource, dest=dest), self._cache)
+        return self._find(type=source.PageSource, dest=dest)
 
     def posts(self, tag=None):
         """Get ordered posts."""
@@ -93,34 +172,37 @@ class Cache():
         if tag is None:
             return self._posts
         else:
-            return list([p for p in self._posts if p.has_tag(tag)])
+            return list(self._tag_index()[1].get(tag, []))
 
     def tags(self):
         """Return a global list of tags with a number of related pages."""
-        if not hasattr(self, '_tags'):
-            self._tags = list(self._get_tags())
-            self._tags.sort(key=lambda item: item['name'])
-        return self._tags
+        return self._tag_index()[0]
 
     def index(self, tag=None):
-        """Returns blog index data with optional tag filtering."""
-        return list([p.data() for p in self.posts(tag=tag)])
+        """Returns blog index records (see source.IndexEntry) with optional
+        tag filtering. Complete index is built once and shared, so it should
+        not be modified."""
+        if tag is not None:
+            return tuple([p.index_entry() for p in self.posts(tag=tag)])
+        if not hasattr(self, '_post_index'):
+            self._post_index = tuple([p.index_entry() for p in self.posts()])
+        return self._post_index
 
     def full_index(self):
         """Return full site index including posts and pages."""
         index = list(self.posts()) + list(self.pages())
-        return list([p.data() for p in index])
+        return list([p.index_entry() for p in index])
 
     def updated(self):
         """Returns last update timestamp of all source files."""
-        return max(source.updated() for source in self._cache)
+        return max(item.updated() for item in self._items.values())
 
     def processing_errors(self):
         """A list of non-digested source files."""
         return self._errors
 
     def _get_posts(self):
-        posts = list(filter(self.cond(source.PostSource), self._cache))
+        posts = self._find(type=source.PostSource)
         posts.sort(key=lambda item: item.created(), reverse=True)
         prev = None
         next = None
@@ -133,18 +215,35 @@ class Cache():
             next = post
         return posts
 
+    def _tag_index(self):
+        """Returns a list of tags sorted by name, and a tag name to
+        ordered posts mapping. Both are built in a single pass."""
+        if not hasattr(self, '_tags'):
+            self._tags = self._get_tags()
+        return self._tags
+
     def _get_tags(self):
-        pages = filter(self.cond(is_inst=source.ParseableSource), self._cache)
-        tags = set()
         counter = dict()
-        for page in pages:
+        for page in self._find(classes=source.ParseableSource):
             for tag in page.data('tags'):
-                tag = tag['name']
-                tags.add(tag)
-                counter[tag] = counter.get(tag, 0) + 1
-        for tag in tags:
-            yield {
-                'name': tag,
-                'count': counter[tag],
-                'url': helpers.tag_url(tag),
-            }
+                counter[tag['name']] = counter.get(tag['name'], 0) + 1
+        tagged = dict()
+        for post in self.posts():
+            for tag in set(tag['name'] for tag in post.data('tags')):
+                tagged.setdefault(tag, []).append(post)
+        tags = [{
+            'name': tag,
+            'count': counter[tag],
+            'url': helpers.tag_url(tag),
+        } for tag in sorted(counter)]
+        return tags, tagged
+
+
+def _load(job):
+    """Create source object (executed by a worker process). Returns the
+    source and None, or None and the exception raised."""
+    src_type, root, rel, stat = job
+    try:
+        return src_type(os.path.join(root, rel), root, stat), None
+    except Exception as e:
+        return None, e
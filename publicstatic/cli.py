@@ -30,6 +30,16 @@ ARGS = {
             'help': 'build output path',
         }
     ),
+    '--jobs': (
+        ['-j', '--jobs'],
+        {
+            'default': None,
+            'type': int,
+            'metavar': 'N',
+            'dest': 'jobs',
+            'help': 'number of parallel rendering processes',
+        }
+    ),
     '--port': (
         ['-p', '--port'],
         {
@@ -102,9 +112,14 @@ CONF = {
         },
         {
             'name': 'build',
-            'args': ['--source', '--output'],
+            'args': ['--source', '--output', '--jobs'],
             'help': 'generate web content from source',
         },
+        {
+            'name': 'watch',
+            'args': ['--source', '--output', '--jobs'],
+            'help': 'build website and rebuild it on source changes',
+        },
         {
             'name': 'run',
             'args': ['--source', '--port', '--browse'],
@@ -130,6 +145,35 @@ CONF = {
             'args': ['name', '--source', '--force', '--edit'],
             'help': 'create new post',
         },
+        {
+            'name': 'cache',
+            'args': [],
+            'help': 'persistent build cache maintenance',
+            'subparsers': [
+                {
+                    'name': 'clear',
+                    'args': ['--source'],
+                    'help': 'delete all cached data',
+                },
+                {
+                    'name': 'stats',
+                    'args': ['--source'],
+                    'help': 'print cache usage statistics',
+                },
+            ],
+        },
+        {
+            'name': 'templates',
+            'args': [],
+            'help': 'template maintenance operations',
+            'subparsers': [
+                {
+                    'name': 'compile',
+                    'args': ['--source'],
+                    'help': 'precompile site and theme templates',
+                },
+            ],
+        },
         {
             'name': 'theme',
             'args': [],
@@ -104,6 +104,17 @@ def find_conf(conf_path):
     return None
 
 
+def export():
+    """Returns configuration state to be restored in a worker process."""
+    return _path, _params
+
+
+def restore(state):
+    """Restores configuration state produced by export()."""
+    global _path, _params
+    _path, _params = state
+
+
 def get(param, default=None):
     """Returns a single configuration parameter or default value."""
     try:
@@ -117,6 +128,13 @@ def set(param, value):
     _params[param] = value
 
 
+def content_params():
+    """Returns configuration parameters affecting generated content."""
+    volatile = const.VOLATILE_PARAMS
+    return {key: value for key, value in _params.items()
+            if key not in volatile}
+
+
 def tags_rel_url():
     return os.path.dirname(get('rel_root_url') + get('tag_location')) + '/'
 
@@ -189,9 +207,16 @@ def _purify(params):
         params[param] = _trsl(params[param].strip())
 
     integers = [
+        'command_jobs',
+        'jobs',
         'port',
         'log_max_size',
         'log_backup_cnt',
+        'md_cache_size',
+        'min_cache_size',
+        'min_js_batch_size',
+        'stream_window',
+        'write_threads',
     ]
 
     for param in integers:
@@ -200,6 +225,15 @@ def _purify(params):
     if isinstance(params['time_format'], str):
         params['time_format'] = [params['time_format']]
 
+    if isinstance(params['ignore'], str):
+        params['ignore'] = [params['ignore']]
+
+    bundles = params['bundles'] or {}
+    for name, assets in bundles.items():
+        if isinstance(assets, str):
+            bundles[name] = [assets]
+    params['bundles'] = bundles
+
     menu = params['menu']
     for item in menu:
         item['href'] = item['href'].strip() if 'href' in item else ''
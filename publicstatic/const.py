@@ -72,6 +72,12 @@ DATA_DIR = 'data'
 # default build output directory path inside website source dir
 BUILD_DIR = 'build'
 
+# directory for persistent build data inside website source dir
+CACHE_DIR = '.cache'
+
+# incremental build manifest file name (inside the cache directory)
+MANIFEST_NAME = 'manifest.json'
+
 # default post name
 UNTITLED_POST = 'untitled-post'
 
@@ -81,6 +87,8 @@ EXPORTS = [
     'author_url',
     'author_twitter',
     'build_path',
+    'bundles',
+    'command_jobs',
     'default_tags',
     'deploy_cmd',
     'disqus_id',
@@ -88,12 +96,21 @@ EXPORTS = [
     'enable_search_form',
     'addthis_id',
     'google_analytics_id',
+    'ignore',
+    'incremental',
+    'jobs',
     'less_cmd',
     'menu',
+    'md_cache_size',
+    'md_engine',
+    'min_cache_size',
     'min_css',
     'min_css_cmd',
+    'min_css_engine',
     'min_html',
     'min_js',
+    'min_js_batch_cmd',
+    'min_js_batch_size',
     'min_js_cmd',
     'pluso_enabled',
     'port',
@@ -101,9 +118,35 @@ EXPORTS = [
     'root_url',
     'site_twitter',
     'source_url',
+    'stream_window',
+    'streaming',
     'subtitle',
     'title',
     'verbose',
+    'watch_interval',
+    'write_threads',
+]
+
+# configuration parameters not affecting generated content (ignored while
+# detecting configuration changes between builds)
+VOLATILE_PARAMS = [
+    'command_jobs',
+    'deploy_cmd',
+    'editor_cmd',
+    'incremental',
+    'jobs',
+    'log_backup_cnt',
+    'log_file',
+    'log_max_size',
+    'md_cache_size',
+    'min_cache_size',
+    'min_js_batch_size',
+    'port',
+    'stream_window',
+    'streaming',
+    'verbose',
+    'watch_interval',
+    'write_threads',
 ]
 
 # configuration parameters
@@ -132,6 +175,17 @@ DEFAULTS = {
         'value': BUILD_DIR,
         'desc': 'Build path for web content generator output',
     },
+    'bundles': {
+        'value': {},
+        'desc': 'Asset bundles: each bundle path (relative to the build '
+                'path, ending with .css or .js) maps to a list of assets '
+                'to be concatenated and minified',
+    },
+    'command_jobs': {
+        'value': 0,
+        'desc': 'Number of external CSS, JavaScript and LESS commands to run '
+                'in parallel (0 to use all CPU cores)',
+    },
     'default_tags': {
         'value': ['misc'],
         'desc': 'A list of default tags to be added to a new post',
@@ -172,6 +226,16 @@ DEFAULTS = {
         'desc': 'Google Analytics tracking ID, e.g. UA-12345678-9 (tracking '
                 'code will be included if the value is not empty)',
     },
+    'ignore': {
+        'value': [],
+        'desc': 'Name patterns for source files and directories to be '
+                'ignored (e.g. "*.bak" or "drafts/*")',
+    },
+    'incremental': {
+        'value': True,
+        'desc': 'Rebuild only pages and posts affected by source, template '
+                'or configuration changes since the previous build',
+    },
     'index_page': {
         'value': 'index.html',
         'desc': 'File name for an index page',
@@ -196,6 +260,11 @@ DEFAULTS = {
         'value': 'English',
         'desc': 'Site Language for humans.txt',
     },
+    'jobs': {
+        'value': 1,
+        'desc': 'Number of parallel processes for page and post rendering '
+                '(0 to use all CPU cores)',
+    },
     'less_cmd': {
         'value': "lessc --compress {source} > {dest}",
         'desc': 'Shell command for LESS compillation',
@@ -212,6 +281,16 @@ DEFAULTS = {
         'value': 1024 * 1024,
         'desc': 'Maximum file size for log rotation (in bytes)',
     },
+    'md_cache_size': {
+        'value': 64,
+        'desc': 'Size limit for the persistent cache of converted markdown '
+                '(megabytes, 0 to disable the cache)',
+    },
+    'md_engine': {
+        'value': 'markdown',
+        'desc': 'Markdown converter: \'markdown\' for Python-Markdown, '
+                'or a full name of a class with convert(text) method',
+    },
     'menu': {
         'value': [
             {'title': 'About', 'href': '/about.html'},
@@ -219,6 +298,11 @@ DEFAULTS = {
         ],
         'desc': 'Navigation menu items',
     },
+    'min_cache_size': {
+        'value': 64,
+        'desc': 'Size limit for the persistent cache of minified HTML, CSS '
+                'and JavaScript (megabytes, 0 to disable the cache)',
+    },
     'min_css': {
         'value': False,
         'desc': 'Enable CSS minification',
@@ -227,6 +311,11 @@ DEFAULTS = {
         'value': "yuicompressor --type css -o {dest} {source}",
         'desc': 'Shell command for CSS minification',
     },
+    'min_css_engine': {
+        'value': 'command',
+        'desc': 'CSS minifier: \'command\' to run min_css_cmd, or '
+                '\'builtin\' for the faster in-process minifier',
+    },
     'min_html': {
         'value': False,
         'desc': 'Remove extra whitespace from HTML',
@@ -235,6 +324,17 @@ DEFAULTS = {
         'value': False,
         'desc': 'Enable JavaScript minification',
     },
+    'min_js_batch_cmd': {
+        'value': '',
+        'desc': 'Shell command for JavaScript minification processing many '
+                'files per run, with {sources}, {dests} or {pairs} (source '
+                'and destination paths alternating) replacements; replaces '
+                'min_js_cmd if defined',
+    },
+    'min_js_batch_size': {
+        'value': 50,
+        'desc': 'Maximum number of files per min_js_batch_cmd run',
+    },
     'min_js_cmd': {
         'value': "yuicompressor --type js --nomunge -o {dest} {source}",
         'desc': 'Shell command for JavaScript minification',
@@ -287,6 +387,18 @@ DEFAULTS = {
         'value': 'http://github.com/username/example.com',
         'desc': 'Website source URL',
     },
+    'stream_window': {
+        'value': 64,
+        'desc': 'Maximum number of pages being rendered by worker processes '
+                'at once in streaming mode',
+    },
+    'streaming': {
+        'value': False,
+        'desc': 'Bounded memory build mode for large websites: page text '
+                'is not kept in memory, templates output is written to '
+                'files in chunks, and rendered content is released after '
+                'each page is written',
+    },
     'subtitle': {
         'value': '',
         'desc': 'Site sublitle',
@@ -312,4 +424,13 @@ DEFAULTS = {
         'value': True,
         'desc': 'Enable verbose logging',
     },
+    'watch_interval': {
+        'value': 0.5,
+        'desc': 'Source files polling interval for watch command (seconds)',
+    },
+    'write_threads': {
+        'value': 2,
+        'desc': 'Number of background threads writing generated pages to '
+                'the build path (0 to write them immediately)',
+    },
 }
@@ -0,0 +1,128 @@
+# coding: utf-8
+
+"""Built-in CSS minifier.
+
+Removes comments (except the ones starting with '/*!') and redundant
+whitespace and semicolons, drops units from zero lengths, and shortens
+six-digit hex colors. Strings and url() values are kept as is."""
+
+import re
+
+# strings, url() values and comments
+PROTECTED_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'"""
+                          r"""|url\(\s*[^)"']*\)|/\*.*?\*/)""", re.S | re.I)
+
+# placeholders for protected strings (\x00) and comments (\x01)
+PLACEHOLDER_RE = re.compile(r"[\x00\x01](\d+)[\x00\x01]")
+
+SPACES_RE = re.compile(r"\s+")
+
+TOKENS_RE = re.compile(r"\x01\d+\x01|[^{};\x01]+|[{};]")
+
+# at-rules containing other rules instead of declarations
+CONTAINER_RULES = ('media', 'supports', 'document', '-moz-document',
+                   'layer', 'container')
+
+ZERO_UNITS_RE = re.compile(r"(?<![\w.#-])(-?)0+(?:\.0+)?"
+                           r"(?:px|em|rem|ex|ch|vw|vh|vmin|vmax|cm|mm|in|pt"
+                           r"|pc)(?![\w%])", re.I)
+
+# functions requiring units for zero lengths
+MATH_FUNCTIONS = ('calc', 'min', 'max', 'clamp')
+
+COLOR_RE = re.compile(r"#([0-9a-f])\1([0-9a-f])\2([0-9a-f])\3(?![0-9a-f])",
+                      re.I)
+
+
+def minify_css(css):
+    """Returns minified CSS."""
+    protected = []
+
+    def protect(match):
+        text = match.group(0)
+        if text.startswith('/*') and not text.startswith('/*!'):
+            return ' '
+        protected.append(text)
+        mark = "\x01" if text.startswith('/*') else "\x00"
+        return "%s%d%s" % (mark, len(protected) - 1, mark)
+
+    css = PROTECTED_RE.sub(protect, css)
+    out = []
+    blocks = []  # True for each open declaration block
+    pending = ''
+    for token in TOKENS_RE.findall(css):
+        if token == '{':
+            prelude = _prelude(pending)
+            out.append(prelude + '{')
+            blocks.append(not _container(prelude))
+            pending = ''
+        elif token == ';' or token == '}':
+            item = _statement(pending, bool(blocks and blocks[-1]))
+            pending = ''
+            if item:
+                out.append(item + (';' if token == ';' else ''))
+            if token == '}':
+                if out and out[-1].endswith(';'):
+                    out[-1] = out[-1][:-1]
+                out.append('}')
+                if blocks:
+                    blocks.pop()
+        elif token.startswith("\x01") and not pending.strip():
+            out.append(token)  # comment between rules or declarations
+            pending = ''
+        else:
+            pending += token
+    out.append(_statement(pending, False))
+
+    restore = lambda match: protected[int(match.group(1))]
+    return PLACEHOLDER_RE.sub(restore, ''.join(out))
+
+
+def _container(prelude):
+    if not prelude.startswith('@'):
+        return False
+    name = re.match(r"@([\w-]*)", prelude).group(1).lower()
+    return name in CONTAINER_RULES or name.endswith('keyframes')
+
+
+def _prelude(text):
+    """Minify selector or at-rule prelude."""
+    text = SPACES_RE.sub(' ', text).strip()
+    if text.startswith('@'):
+        text = re.sub(r" ?([,:]) ?", r"\1", text)
+        return re.sub(r"\( | \)", lambda m: m.group(0).strip(), text)
+    return re.sub(r" ?([,>+~]) ?", r"\1", text)
+
+
+def _statement(text, declaration):
+    """Minify declaration or at-rule statement (like @import)."""
+    text = SPACES_RE.sub(' ', text).strip()
+    if not declaration or ':' not in text or text.startswith('@'):
+        return re.sub(r" ?, ?", ',', text)
+    name, value = text.split(':', 1)
+    value = re.sub(r" ?([,/]) ?", r"\1", value.strip())
+    value = re.sub(r"\( | \)", lambda m: m.group(0).strip(), value)
+    value = re.sub(r" ?! ?important", '!important', value, flags=re.I)
+    if not name.strip().startswith('--'):  # custom properties are kept
+        value = _zero_units(value)
+    value = re.sub(r"^-0$|(?<=[ ,(])-0(?![\w.%])", '0', value)
+    value = COLOR_RE.sub(r"#\1\2\3", value)
+    return name.strip() + ':' + value
+
+
+def _zero_units(value):
+    """Drop units from zero lengths outside of math functions, where
+    unitless zeros are invalid."""
+    parts = re.split(r"([()])", value)
+    math = []  # True for each open function within a math function
+    for num, part in enumerate(parts):
+        if part == '(':
+            name = re.search(r"[\w-]*$", parts[num - 1]).group(0).lower()
+            math.append(bool(math and math[-1]) or name in MATH_FUNCTIONS or
+                        name.endswith('-calc'))
+        elif part == ')':
+            if math:
+                math.pop()
+        elif not (math and math[-1]):
+            parts[num] = ZERO_UNITS_RE.sub(r"\g<1>0", part)
+    return ''.join(parts)
@@ -1,4 +1,6 @@
+import csv
 import markdown
+from publicstatic import templates
 
 PREFIX = '--- data:'
 
@@ -0,0 +1,62 @@
+# coding: utf-8
+
+"""Build dependencies tracking.
+
+Rendering routines record the templates and data files they use, and
+builders collect these records for each output to find out which outputs
+should be rebuilt when a template or a data file changes. Dependencies
+are identified by string keys: 'template:<name>' for templates (resolved
+by the template loader), and 'file:<path>' for any other files."""
+
+import contextlib
+import threading
+
+TEMPLATE = 'template'
+FILE = 'file'
+
+_local = threading.local()
+
+
+def template(name):
+    """Record dependency on a template."""
+    record(TEMPLATE, name)
+
+
+def file(path):
+    """Record dependency on a file."""
+    record(FILE, path)
+
+
+def record(kind, name):
+    """Add a dependency to all active collectors."""
+    for found in _collectors():
+        found.add(key(kind, name))
+
+
+def key(kind, name):
+    """Returns dependency key."""
+    return "%s:%s" % (kind, name)
+
+
+def parse(key):
+    """Split dependency key to (kind, name) couple."""
+    kind, name = key.split(':', 1)
+    return kind, name
+
+
+@contextlib.contextmanager
+def collect():
+    """Context manager collecting dependencies recorded within its
+    scope (by the current thread) to a set."""
+    found = set()
+    _collectors().append(found)
+    try:
+        yield found
+    finally:
+        _collectors().pop()
+
+
+def _collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
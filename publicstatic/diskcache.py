@@ -0,0 +1,96 @@
+# coding: utf-8
+
+"""Persistent content-addressed storage for generated data."""
+
+import os
+import tempfile
+from publicstatic import helpers
+
+
+class DiskCache():
+    """Size-bounded persistent storage for text values. Each value is kept
+    in a separate file named after the key (usually a content hash).
+    Least recently used values are evicted when the total size of the
+    storage exceeds the limit."""
+
+    def __init__(self, path, max_size):
+        """Initialize cache object.
+
+        Arguments:
+        @path - cache directory path.
+        @max_size - storage size limit in bytes."""
+        self._path = path
+        self._max_size = max_size
+
+    def path(self, key=None):
+        """Cache directory path, or a file name for the specified key."""
+        if key is None:
+            return self._path
+        return os.path.join(self._path, key[:2], key)
+
+    def max_size(self):
+        return self._max_size
+
+    def get(self, key):
+        """Returns cached value, or None if there is no one."""
+        file_name = self.path(key)
+        try:
+            with open(file_name, mode='r', encoding='utf-8', newline='') as f:
+                value = f.read()
+            os.utime(file_name)  # mark entry as recently used
+            return value
+        except (IOError, OSError):
+            return None
+
+    def put(self, key, value):
+        """Store a value. The file is written atomically, so concurrent
+        processes never see partially written entries."""
+        file_name = self.path(key)
+        helpers.makedirs(os.path.dirname(file_name))
+        handle, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file_name))
+        try:
+            with open(handle, mode='w', encoding='utf-8', newline='') as f:
+                f.write(value)
+            os.replace(tmp_name, file_name)
+        except (IOError, OSError):
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+    def prune(self):
+        """Evict least recently used entries exceeding the size limit."""
+        entries = self._entries()
+        size = sum(entry[1] for entry in entries)
+        entries.sort()
+        while entries and size > self._max_size:
+            mtime, entry_size, file_name = entries.pop(0)
+            try:
+                os.remove(file_name)
+                size -= entry_size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Delete all cached values."""
+        helpers.rmdir(self._path)
+
+    def stats(self):
+        """Returns the number of cached values and their total size."""
+        entries = self._entries()
+        return len(entries), sum(entry[1] for entry in entries)
+
+    def _entries(self):
+        """Returns a list of (last use time, size, file name) tuples."""
+        result = []
+
+        def add(root, rel_path):
+            file_name = os.path.join(root, rel_path)
+            try:
+                stat = os.stat(file_name)
+                result.append((stat.st_mtime, stat.st_size, file_name))
+            except OSError:
+                pass
+
+        if os.path.isdir(self._path):
+            helpers.walk(self._path, add)
+        return result
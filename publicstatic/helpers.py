@@ -4,9 +4,13 @@
 
 import codecs
 from datetime import datetime
+import hashlib
+import json
 import os
 import re
+import shlex
 import shutil
+import subprocess
 import sys
 import time
 from publicstatic import conf
@@ -18,7 +22,7 @@ RE_H1 = re.compile(r"^\s*#\s*(.*)\s*", re.I | re.M | re.U)
 def makedirs(dir_path):
     """Creates directory if it not exists."""
     if dir_path and not os.path.isdir(dir_path):
-        os.makedirs(dir_path)
+        os.makedirs(dir_path, exist_ok=True)
         return True
     return False
 
@@ -88,13 +92,27 @@ def copydir(source, dest, force=False):
     return existing
 
 
+def visible(name):
+    """Returns False for the directory names to be ignored."""
+    return not name.startswith('_')
+
+
+def hidden(rel_path):
+    """Returns True if the file is located in an ignored directory."""
+    return not all(map(visible, os.path.dirname(rel_path).split(os.sep)))
+
+
+def within(path, dir_path):
+    """Returns True if the path is located inside the directory."""
+    return path.startswith(os.path.join(dir_path, ''))
+
+
 def walk(path, operation):
     """Performs operation for each file in the specified path.
 
     - Operation should take two arguments: the original path and
       additional relative path to each file.
     - Directory names starting with underscore will be ignored."""
-    visible = lambda name: not name.startswith('_')
     for curdir, dirnames, curfiles in os.walk(path):
         dirnames[:] = filter(visible, dirnames)
         for nextfile in curfiles:
@@ -120,6 +138,60 @@ def execute(command, source, dest=''):
     os.system(os.path.expandvars(command.format(source=source, dest=dest)))
 
 
+def digest(*values):
+    """Returns SHA-1 hex digest for a sequence of values. Non-string values
+    are serialized to JSON with sorted keys, so equal dictionaries always
+    produce equal digests."""
+    result = hashlib.sha1()
+    for value in values:
+        if not isinstance(value, str):
+            value = json.dumps(value, sort_keys=True, default=str)
+        result.update(value.encode('utf-8'))
+        result.update(b'\0')
+    return result.hexdigest()
+
+
+def run(command, source, dest=''):
+    """Executes a command with {source} and {dest} parameter replacements,
+    and captures its output. Returns exit code, stdout and stderr."""
+    command = os.path.expandvars(command.format(source=source, dest=dest))
+    return _run(command)
+
+
+def run_batch(command, pairs):
+    """Executes a command processing many files per run, with {sources},
+    {dests} and {pairs} parameter replacements for space-separated lists
+    of quoted source paths, destination paths, and both of them
+    alternating. @pairs is a list of (source, dest) tuples. Returns exit
+    code, stdout and stderr."""
+    quote = lambda paths: ' '.join(shlex.quote(path) for path in paths)
+    command = os.path.expandvars(command).format(
+        sources=quote(source for source, _ in pairs),
+        dests=quote(dest for _, dest in pairs),
+        pairs=quote(path for pair in pairs for path in pair))
+    return _run(command)
+
+
+def _run(command):
+    process = subprocess.Popen(command,
+                               shell=True,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    return (process.returncode,
+            stdout.decode('utf-8', 'replace'),
+            stderr.decode('utf-8', 'replace'))
+
+
+def file_digest(path):
+    """Returns SHA-1 hex digest of the file contents."""
+    result = hashlib.sha1()
+    with open(path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            result.update(chunk)
+    return result.hexdigest()
+
+
 def mergedicts(*args):
     """Merge a set of dictionaries."""
     result = {}
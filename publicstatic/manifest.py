@@ -0,0 +1,156 @@
+# coding: utf-8
+
+"""Incremental build manifest.
+
+The manifest keeps track of the inputs each page or post was rendered from
+(source file hash and configuration), its dependencies on templates and
+data files, and the output files it produced. Sources with unchanged
+inputs and dependencies are skipped on the next build."""
+
+import codecs
+import json
+import os
+from publicstatic import conf
+from publicstatic import const
+from publicstatic import deps
+from publicstatic import helpers
+from publicstatic import logger
+from publicstatic import pathes
+from publicstatic import templates
+
+# manifest format version; files with other version values are discarded
+VERSION = 1
+
+_entries = {}  # source key -> manifest record
+_visited = set()  # keys of the sources checked during current build
+_digests = {}  # memoized configuration and dependencies digests
+
+
+def path():
+    """Full path to the manifest file."""
+    return pathes.cache(const.MANIFEST_NAME)
+
+
+def load():
+    """Read manifest from the previous build, if there is one."""
+    global _entries
+    _entries = {}
+    reset()
+    if not conf.get('incremental') or not os.path.isfile(path()):
+        return
+    try:
+        with codecs.open(path(), mode='r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == VERSION:
+            _entries = data.get('entries', {})
+    except (IOError, OSError, ValueError) as ex:
+        logger.warn('build manifest was ignored: ' + str(ex))
+
+
+def reset():
+    """Start a new build cycle keeping the loaded records. Dependencies
+    will be checked for changes again."""
+    global _visited, _digests
+    _visited, _digests = set(), {}
+
+
+def save(prune=True):
+    """Write the manifest to disk. If @prune is True, records of the sources
+    not checked during current build cycle are dropped along with their
+    output files (so all pages and posts should be processed before)."""
+    if not conf.get('incremental'):
+        return
+    obsolete = []
+    if prune:
+        obsolete = [_entries.pop(key) for key in set(_entries) - _visited]
+    if obsolete:
+        claimed = set(o for entry in _entries.values() for o in entry['outputs'])
+        for entry in obsolete:
+            _remove_outputs(set(entry['outputs']) - claimed)
+    helpers.makedirs(os.path.dirname(path()))
+    with codecs.open(path(), mode='w', encoding='utf-8') as f:
+        json.dump({'version': VERSION, 'entries': _entries}, f)
+
+
+def changed(source, extra=None):
+    """Returns True if the source file should be rebuilt because it is new,
+    its inputs changed since the previous build, or some of its output files
+    are missing. @extra is an optional value for additional dependencies."""
+    key = _key(source)
+    _visited.add(key)
+    entry = _entries.get(key)
+    if not conf.get('incremental') or entry is None:
+        return True
+    if entry['inputs'] != inputs(source, extra):
+        return True
+    for key, value in entry['deps'].items():
+        if _dep_digest(key) != value:
+            return True
+    build_path = conf.get('build_path')
+    return not all(os.path.isfile(os.path.join(build_path, output))
+                   for output in entry['outputs'])
+
+
+def update(source, outputs, dependencies, extra=None):
+    """Record inputs, dependencies (see deps module) and output files
+    (relative to the build path) of a successfully built source file."""
+    _entries[_key(source)] = {
+        'inputs': inputs(source, extra),
+        'deps': {key: _dep_digest(key) for key in dependencies},
+        'outputs': list(outputs),
+    }
+
+
+def discard(outputs):
+    """Forget records of the sources producing any of the specified output
+    files (relative to the build path), e.g. if they failed to be written."""
+    outputs = set(outputs)
+    for key in [key for key, entry in _entries.items()
+                if outputs.intersection(entry['outputs'])]:
+        del _entries[key]
+
+
+def dependents(key):
+    """Returns paths of the source files depending on the specified
+    dependency (see deps module) according to the previous builds."""
+    return [os.path.join(pathes.site(), name)
+            for name, entry in _entries.items() if key in entry['deps']]
+
+
+def inputs(source, extra=None):
+    """Returns a dictionary of hashes for everything the source file
+    is rendered from."""
+    if 'config' not in _digests:
+        _digests['config'] = helpers.digest(conf.content_params())
+    return {
+        'source': source.digest(),
+        'config': _digests['config'],
+        'extra': extra,
+    }
+
+
+def _key(source):
+    return os.path.relpath(source.path(), pathes.site())
+
+
+def _dep_digest(key):
+    """Returns current hash of a dependency, or None if it is missing."""
+    if key not in _digests:
+        kind, name = deps.parse(key)
+        if kind == deps.TEMPLATE:
+            _digests[key] = templates.digest(name)
+        elif os.path.isfile(name):
+            _digests[key] = helpers.file_digest(name)
+        else:
+            _digests[key] = None
+    return _digests[key]
+
+
+def _remove_outputs(outputs):
+    """Delete output files of the source removed from the website."""
+    build_path = conf.get('build_path')
+    for output in outputs:
+        file_name = os.path.join(build_path, output)
+        if os.path.isfile(file_name):
+            logger.info('removing obsolete output: ' + output)
+            os.remove(file_name)
@@ -1,12 +1,20 @@
 # coding: utf-8
 
 import csv
+import importlib
 import markdown
 import re
-from publicstatic import templates
+import threading
+from publicstatic import conf
 from publicstatic import data
+from publicstatic import diskcache
+from publicstatic import helpers
+from publicstatic import pathes
+from publicstatic import templates
 from publicstatic import urlize
 
+# cache directory name (inside the site cache directory)
+CACHE_DIR = 'markdown'
 
 EXTENSIONS = [
     'codehilite',
@@ -20,6 +28,111 @@ EXTENSIONS = [
 ]
 
 
+class PythonMarkdown():
+    """Python-Markdown based converter. Keeps a long-lived Markdown instance
+    for each thread, and resets it between documents instead of creating
+    a new instance and registering all extensions for each one."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def convert(self, text):
+        if not hasattr(self._local, 'md'):
+            self._local.md = markdown.Markdown(extensions=EXTENSIONS)
+        return self._local.md.reset().convert(text)
+
+
+# available converters; 'md_engine' configuration parameter should be one
+# of the names, or a full name of a class implementing convert(text) method
+ENGINES = {
+    'markdown': PythonMarkdown,
+}
+
+_cache = None
+_engine = None
+_signature = None
+
+
 def md(text):
-    """Converts markdown formatted text to HTML"""
-    return markdown.markdown(text.strip(), extensions=EXTENSIONS)
+    """Converts markdown formatted text to HTML. Results are cached
+    on disk, keyed by the text and markdown configuration hash.
+    Texts embedding data files are always converted."""
+    text = text.strip()
+    if not conf.get('md_cache_size') or data.PREFIX in text:
+        return engine().convert(text)
+
+    key = helpers.digest(signature(), text)
+    html = cache().get(key)
+    if html is None:
+        html = engine().convert(text)
+        cache().put(key, html)
+    return html
+
+
+def reset():
+    """Drop the converter, cache and signature (to be called after
+    configuration changes)."""
+    global _cache, _engine, _signature
+    _cache = _engine = _signature = None
+
+
+def engine():
+    """Returns converter instance for the current process."""
+    global _engine
+    if _engine is None:
+        _engine = load_engine(conf.get('md_engine'))()
+    return _engine
+
+
+def load_engine(name):
+    """Returns converter class by the engine name or full class name."""
+    if name in ENGINES:
+        return ENGINES[name]
+    module_name, _, class_name = name.rpartition('.')
+    if not module_name:
+        raise ValueError("unknown markdown engine: '%s'" % name)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def cache():
+    """Persistent cache for converted markdown."""
+    global _cache
+    if _cache is None:
+        max_size = conf.get('md_cache_size') * 1024 * 1024
+        _cache = diskcache.DiskCache(pathes.cache(CACHE_DIR), max_size)
+    return _cache
+
+
+def signature():
+    """Returns a hash of the markdown converter configuration, including
+    extension settings and the versions of libraries affecting output."""
+    global _signature
+    if _signature is None:
+        values = [conf.get('md_engine'),
+                  _version(markdown),
+                  _version('pygments')]
+        for ext in EXTENSIONS:
+            if isinstance(ext, str):
+                values.append(ext)
+            else:
+                values.append(type(ext).__module__ + '.' + type(ext).__name__)
+                values.append(ext.getConfigs())
+        _signature = helpers.digest(*values)
+    return _signature
+
+
+def _version(module):
+    """Returns version of the module, or an empty string if the module
+    is not available."""
+    if isinstance(module, str):
+        try:
+            module = __import__(module)
+        except ImportError:
+            return ''
+    # Markdown 2.x has version string in 'version', and '__version__'
+    # is a submodule there
+    for attr in ['__version__', 'version']:
+        value = getattr(module, attr, None)
+        if isinstance(value, str):
+            return value
+    return ''
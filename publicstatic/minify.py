@@ -1,63 +1,298 @@
 # encoding: utf-8
 
-# This code is forked from django-htmlmin library:
-# https://github.com/cobrateam/django-htmlmin
+"""Single-pass HTML minifier.
+
+The document is split into tags, comments and text by a tokenizer working
+on a stream of chunks, without building a document tree:
+
+- whitespace runs containing a line break are removed next to tags (except
+  the ones following a link), other whitespace runs are collapsed to a
+  single space;
+- comments are removed, except single-line conditional comments;
+- the content of the elements listed in EXCLUDE_TAGS is kept as is;
+- tag and attribute names are lowercased, attributes are sorted and
+  quoted, void elements are self-closed."""
 
 import re
-import bs4
-from html.parser import HTMLParser
+from publicstatic import conf
+from publicstatic import diskcache
+from publicstatic import helpers
+from publicstatic import pathes
+from publicstatic.version import __version__
 
+# cache directory name (inside the site cache directory)
+CACHE_DIR = 'minify'
+
+# elements with the content to be kept untouched
 EXCLUDE_TAGS = ('pre', 'script', 'textarea')
 
+# elements with the content not containing tags
+RAWTEXT_TAGS = EXCLUDE_TAGS + ('style',)
+
+# end tags for the elements with unparsed content
+CLOSING_RE = dict((tag, re.compile(r"</%s(?=[\s/>])" % tag, re.I))
+                  for tag in RAWTEXT_TAGS)
+
+# elements ignoring a line break right after the start tag
+NEWLINE_TAGS = ('pre', 'textarea')
+
+VOID_TAGS = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+             'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr')
+
 COND_RE = re.compile(r"<!--\[if .*\]>.*<!\[endif\]-->")
 
 SPACES_RE = re.compile(r"\s+")
 
+START_TAG_RE = re.compile(r"""<([a-zA-Z][^\s/>]*)((?:\s+[^\s"'>/=]+"""
+                          r"""(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'>]+))?"""
+                          r"""|\s*/(?!>))*)\s*(/?)>""")
 
-def minify_html(html, ignore_comments=True):
-    soup = bs4.BeautifulSoup(html, 'html5lib')
-    html = str(soup)
-    exclude_tags = {}
+ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'"""
+                     r"""|([^\s"'>]+)))?""")
+
+END_TAG_RE = re.compile(r"</([a-zA-Z][^\s/>]*)[^>]*>")
+
+DOCTYPE_RE = re.compile(r"<!doctype\s+([^\s>]+)([^>]*)>", re.I)
+
+# unfinished tags longer than this are treated as text
+MAX_TAG_LEN = 65536
+
+
+_cache = None
+
+
+class Minifier():
+    """Streaming HTML minifier. Feed document chunks one by one, and
+    concatenate the returned strings with the output of close()."""
+
+    def __init__(self, ignore_comments=True):
+        self._ignore_comments = ignore_comments
+        self._buf = ''
+        self._out = []
+        self._ws = ''  # pending whitespace
+        self._prev = None  # last output: None, 'tag', 'link' or 'text'
+        self._raw = None  # the element with unparsed content being read
+        self._newline = False  # True if a line break should be skipped
 
-    for tag in EXCLUDE_TAGS:
-        items = [str(e) for e in soup.findAll(name=tag) if len(e.text) > 0]
-        for index, elem in enumerate(items):
-            html = html.replace(elem, _tag(tag, index))
-        exclude_tags[tag] = items
+    def feed(self, html):
+        """Process a chunk of the document. Returns minified HTML
+        for the part of the document processed so far."""
+        self._buf += html
+        self._process(final=False)
+        return self._flush()
 
-    soup = bs4.BeautifulSoup(html, 'html5lib')
+    def close(self):
+        """Process the rest of the document. Returns minified HTML."""
+        self._process(final=True)
+        self._ws = ''
+        return self._flush()
+
+    def _flush(self):
+        result = ''.join(self._out)
+        self._out = []
+        return result
+
+    def _process(self, final):
+        buf = self._buf
+        pos = 0
+        while pos < len(buf):
+            if self._raw:
+                pos = self._raw_text(buf, pos, final)
+                if self._raw:
+                    break
+                continue
+            start = buf.find('<', pos)
+            if start < 0:
+                self._text(buf[pos:])
+                pos = len(buf)
+                break
+            if start > pos:
+                self._text(buf[pos:start])
+                pos = start
+            end = self._markup(buf, pos, final)
+            if end is None:  # incomplete markup, waiting for more data
+                break
+            pos = end
+        self._buf = buf[pos:]
+
+    def _raw_text(self, buf, pos, final):
+        """Process the content of an element, which should not be parsed
+        for tags. Returns the position to continue from."""
+        if self._newline:
+            if len(buf) - pos < 2 and not final:
+                return pos
+            if buf.startswith('\r\n', pos):
+                pos += 2
+            elif buf.startswith('\n', pos) or buf.startswith('\r', pos):
+                pos += 1
+            self._newline = False
+        match = CLOSING_RE[self._raw].search(buf, pos)
+        if match:
+            self._raw_content(buf[pos:match.start()])
+            self._raw = None
+            return match.start()
+        end = len(buf)
+        if not final:  # keep a possible beginning of the end tag
+            end = max(pos, end - len(self._raw) - 2)
+        self._raw_content(buf[pos:end])
+        return end
+
+    def _raw_content(self, text):
+        if self._raw in EXCLUDE_TAGS:
+            if text:
+                self._out.append(text)
+                self._prev = 'text'
+        else:
+            self._text(text)
+
+    def _markup(self, buf, pos, final):
+        """Process markup at the position. Returns the position after it,
+        or None if more data is needed."""
+        if buf.startswith('<!--', pos):
+            end = buf.find('-->', pos + 4)
+            if end < 0:
+                return len(buf) if final else None
+            comment = buf[pos:end + 3]
+            if not self._ignore_comments or COND_RE.match(comment):
+                self._tag(comment)
+            return end + 3
+
+        if buf.startswith('<![CDATA[', pos):
+            end = buf.find(']]>', pos)
+            if end < 0:
+                return self._literal(buf, pos, final)
+            self._tag(buf[pos:end + 3])
+            return end + 3
+
+        if buf.startswith('<!', pos) or buf.startswith('<?', pos):
+            end = buf.find('>', pos)
+            if end < 0:
+                return self._literal(buf, pos, final)
+            decl = buf[pos:end + 1]
+            match = DOCTYPE_RE.match(decl)
+            if match:
+                decl = "<!DOCTYPE %s%s>" % (match.group(1).lower(),
+                                            match.group(2).rstrip())
+            self._tag(decl)
+            return end + 1
+
+        if buf.startswith('</', pos):
+            match = END_TAG_RE.match(buf, pos)
+            if not match:
+                return self._literal(buf, pos, final)
+            name = match.group(1).lower()
+            self._tag("</%s>" % name, link=(name == 'a'))
+            return match.end()
+
+        match = START_TAG_RE.match(buf, pos)
+        if not match:
+            return self._literal(buf, pos, final)
+        name = match.group(1).lower()
+        attrs = {}
+        for attr in ATTR_RE.finditer(match.group(2)):
+            attr_name, dq, sq, nq = attr.groups()
+            value = next((v for v in (dq, sq, nq) if v is not None), '')
+            attrs.setdefault(attr_name.lower(), value)
+        tag = '<' + name
+        for attr_name in sorted(attrs):
+            value = attrs[attr_name]
+            quote = "'" if '"' in value else '"'
+            tag += " %s=%s%s%s" % (attr_name, quote, value, quote)
+        closed = name in VOID_TAGS or match.group(3)
+        self._tag(tag + ('/>' if closed else '>'))
+        if name in RAWTEXT_TAGS and not closed:
+            self._raw = name
+            self._newline = name in NEWLINE_TAGS
+        return match.end()
+
+    def _literal(self, buf, pos, final):
+        """Treat '<' as text if the markup is malformed. Returns None
+        if the markup could be completed by the following data."""
+        if not final and len(buf) - pos < MAX_TAG_LEN and \
+                re.match(r"<(/?[a-zA-Z!?]|/?$)", buf[pos:pos + 3]):
+            return None
+        self._text('<')
+        return pos + 1
+
+    def _tag(self, markup, link=False):
+        self._whitespace(next_markup=markup)
+        self._out.append(markup)
+        self._prev = 'link' if link else 'tag'
+
+    def _text(self, text):
+        core = text.strip()
+        if not core:
+            self._ws += text
+            return
+        self._ws += text[:len(text) - len(text.lstrip())]
+        self._whitespace()
+        self._out.append(SPACES_RE.sub(' ', core))
+        self._ws = text[len(text.rstrip()):]
+        self._prev = 'text'
+
+    def _whitespace(self, next_markup=None):
+        """Output pending whitespace followed by the next markup, or text
+        if @next_markup is None."""
+        ws, self._ws = self._ws, ''
+        if not ws or self._prev is None:
+            return
+        if '\n' not in ws and '\r' not in ws:
+            self._out.append(' ')
+        elif self._prev == 'text' and next_markup is None:
+            self._out.append(' ')
+        elif self._prev == 'link' and next_markup != '</body>':
+            self._out.append(' ')
+
+
+def minify_html(html, ignore_comments=True):
+    """Minify HTML document."""
+    minifier = Minifier(ignore_comments)
+    return minifier.feed(html) + minifier.close()
 
-    if ignore_comments:
-        f = lambda text: isinstance(text, bs4.Comment) and not \
-                         COND_RE.match(text.output_ready())
-        for comment in soup.findAll(text=f):
-            comment.extract()
 
-    lines = str(soup).replace(' \n', ' ').split('\n')
-    minified_lines = []
+def cached_minify_html(html):
+    """Minify HTML document reusing the result for the same input
+    from the persistent cache."""
+    if not conf.get('min_cache_size'):
+        return minify_html(html)
+    key = helpers.digest('html', __version__, html)
+    result = cache().get(key)
+    if result is None:
+        result = minify_html(html)
+        cache().put(key, result)
+    return result
 
-    for num, line in enumerate(lines):
-        line = line.strip()
-        if not _between(line, minified_lines, num):
-            line = ' ' + line
-        minified_lines.append(line)
-        if line.endswith('</a>') and not lines[num + 1].startswith('</body>'):
-            minified_lines.append(' ')
 
-    content = SPACES_RE.sub(' ', ''.join(minified_lines))
+def command_key(command, *file_names):
+    """Returns minification cache key for the result of an external
+    command processing the specified files, or None if the cache is
+    disabled."""
+    if not conf.get('min_cache_size'):
+        return None
+    digests = [helpers.file_digest(file_name) for file_name in file_names]
+    return helpers.digest(command, digests)
 
-    for tag in EXCLUDE_TAGS:
-        for num, e in enumerate(exclude_tags[tag]):
-            content = content.replace(_tag(tag, num), HTMLParser().unescape(e))
 
-    return content
+def cache():
+    """Persistent cache for minified outputs."""
+    global _cache
+    if _cache is None:
+        max_size = conf.get('min_cache_size') * 1024 * 1024
+        _cache = diskcache.DiskCache(pathes.cache(CACHE_DIR), max_size)
+    return _cache
 
 
-def _between(current_line, all_lines, index):
-    return not current_line or \
-           current_line.startswith('<') or \
-           all_lines[index - 1].endswith('>')
+def reset():
+    """Drop the cache (to be called after configuration changes)."""
+    global _cache
+    _cache = None
 
 
-def _tag(tag, index):
-    return "<%s>%d</%s>" % (tag, index, tag)
+def minify_html_stream(chunks, ignore_comments=True):
+    """Minify HTML generated in chunks. Yields minified HTML chunks."""
+    minifier = Minifier(ignore_comments)
+    for chunk in chunks:
+        result = minifier.feed(chunk)
+        if result:
+            yield result
+    yield minifier.close()
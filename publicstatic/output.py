@@ -0,0 +1,230 @@
+# coding: utf-8
+
+"""Build output files writing.
+
+Existing files are replaced only if the new contents differ, so identical
+outputs keep their modification times, and synchronization tools could
+tell which files were actually changed by the build. Each write is
+counted as changed or unchanged for the build summary.
+
+Files are written atomically via temporary files. After start() is called,
+rendered text is written by a pool of background threads, so rendering
+does not wait for the disk; flush() waits for the pending writes."""
+
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import filecmp
+import os
+import shutil
+import threading
+from publicstatic import helpers
+from publicstatic import logger
+
+# maximum number of queued writes per writer thread
+QUEUE_SIZE = 16
+
+_lock = threading.Lock()
+_counts = {'changed': 0, 'unchanged': 0}
+_local = threading.local()
+_dirs = set()  # output directories known to exist
+_writer = None  # background writer state: pool, process id, queue slots
+_pending = []  # (future, path, label) for the queued writes
+_failed = []  # files failed to be written since the writer was started
+
+
+def start(threads):
+    """Start background writer threads for the current process
+    (no threads are used if the number is 0)."""
+    global _writer
+    stop()
+    _dirs.clear()
+    if threads > 0:
+        slots = threading.BoundedSemaphore(threads * QUEUE_SIZE)
+        _writer = ThreadPoolExecutor(threads), os.getpid(), slots
+
+
+def stop():
+    """Wait for pending writes and stop background writer threads.
+    Returns a list of files failed to be written since start()."""
+    global _writer, _failed
+    flush()
+    if _writer is not None:
+        _writer[0].shutdown()
+        _writer = None
+    failed, _failed = _failed, []
+    return failed
+
+
+def flush():
+    """Wait for pending writes to complete. Errors are logged with the
+    label of the page being rendered when the write was queued."""
+    global _pending
+    pending, _pending = _pending, []
+    for future, path, label in pending:
+        error = future.exception()
+        if error is not None:
+            logger.error("%s: writing '%s' failed: %s" % (
+                label or 'output', path, error))
+            _failed.append(path)
+
+
+@contextlib.contextmanager
+def label(name):
+    """Context manager attributing writes queued within its scope (by the
+    current thread) to the specified page, for error messages."""
+    _local.label = name
+    try:
+        yield
+    finally:
+        _local.label = None
+
+
+def makedirs(dir_path):
+    """Create output directory if it does not exist. Directories created
+    or found before are not checked again."""
+    if dir_path in _dirs:
+        return
+    os.makedirs(dir_path, exist_ok=True)
+    with _lock:
+        _dirs.add(dir_path)
+
+
+def write(path, text, mtime=None):
+    """Write text to a file in UTF-8, if the file contents differ.
+    The file is written by a background thread if the writer is started
+    (returns None in this case), or immediately otherwise (returns True
+    if the file was written). Optional @mtime (a datetime) is set as
+    the modification time of the written file."""
+    if _writer is None or _writer[1] != os.getpid():
+        return _write(path, text, mtime)
+    pool, pid, slots = _writer
+    slots.acquire()  # limit the amount of text waiting to be written
+    try:
+        future = pool.submit(_write, path, text, mtime)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda future: slots.release())
+    _pending.append((future, path, getattr(_local, 'label', None)))
+
+
+def write_chunks(path, chunks):
+    """Write text chunks to a file in UTF-8 as they are produced (always
+    in the current thread). Existing file is replaced only if the result
+    differs from it. Returns True if the file was replaced."""
+    tmp = tmp_path(path)
+    try:
+        with open(tmp, mode='wb') as f:
+            for chunk in chunks:
+                f.write(chunk.encode('utf-8'))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return commit(tmp, path)
+
+
+def copy(source_path, path):
+    """Copy a file, if the destination file differs.
+    Returns True if the file was copied."""
+    if os.path.isfile(path) and filecmp.cmp(source_path, path, shallow=False):
+        return _record(False)
+    tmp = tmp_path(path)
+    try:
+        shutil.copyfile(source_path, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return _record(True)
+
+
+def commit(tmp_path, path):
+    """Replace a file with a temporary one written by an external tool,
+    if their contents differ. Temporary file is removed in any case.
+    Returns True if the file was replaced."""
+    if os.path.isfile(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return _record(False)
+    os.replace(tmp_path, path)
+    return _record(True)
+
+
+def tmp_path(path):
+    """Temporary file name for the output file (located in the same
+    directory to be renamed atomically)."""
+    dir_path, name = os.path.split(path)
+    return os.path.join(dir_path, ".%s.%d.%d.tmp" % (
+        name, os.getpid(), threading.get_ident()))
+
+
+def reset():
+    """Reset changed and unchanged file counters."""
+    with _lock:
+        _counts['changed'] = 0
+        _counts['unchanged'] = 0
+
+
+def counts():
+    """Returns the numbers of changed and unchanged files written."""
+    with _lock:
+        return _counts['changed'], _counts['unchanged']
+
+
+def add(changed, unchanged):
+    """Add the numbers counted elsewhere (e.g. by a worker process)."""
+    with _lock:
+        _counts['changed'] += changed
+        _counts['unchanged'] += unchanged
+
+
+@contextlib.contextmanager
+def collect():
+    """Context manager counting files written within its scope (by the
+    current thread) to a separate dictionary instead of global counters.
+    Used to pass the counts back from worker processes."""
+    found = {'changed': 0, 'unchanged': 0}
+    _collectors().append(found)
+    try:
+        yield found
+    finally:
+        _collectors().pop()
+
+
+def _write(path, text, mtime=None):
+    data = text.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, mode='rb') as f:
+                if f.read() == data:
+                    return _record(False)
+    except OSError:
+        pass
+    tmp = tmp_path(path)
+    try:
+        with open(tmp, mode='wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if mtime is not None:
+        helpers.utime(path, mtime)
+    return _record(True)
+
+
+def _record(changed):
+    key = 'changed' if changed else 'unchanged'
+    collectors = _collectors()
+    if collectors:
+        collectors[-1][key] += 1
+    else:
+        with _lock:
+            _counts[key] += 1
+    return changed
+
+
+def _collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
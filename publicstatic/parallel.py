@@ -0,0 +1,77 @@
+# coding: utf-8
+
+"""Worker process pool for CPU-bound build stages."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+from publicstatic import conf
+
+_shared = None  # data shipped to each worker process once
+
+
+def jobs(param='jobs'):
+    """Number of workers to use according to the configuration parameter
+    (0 means one worker per CPU core)."""
+    count = conf.get(param, 1)
+    return count if count > 0 else (os.cpu_count() or 1)
+
+
+def shared():
+    """Returns data shared with all workers by the current imap() call."""
+    return _shared
+
+
+def imap(func, items, shared=None, limit=None):
+    """Applies a function to each item using a pool of worker processes,
+    and yields results in the original order. The function should be
+    defined at module level to be picklable. Optional @shared data
+    is sent to each worker once, and is available there via shared().
+    If @limit is specified, no more than this number of items are
+    submitted to workers before their results are consumed. Items are
+    processed in the current process if only one job is configured."""
+    items = list(items)
+    count = min(jobs(), len(items))
+    if count < 2:
+        _init(conf.export(), shared)
+        for item in items:
+            yield func(item)
+        return
+
+    pool = multiprocessing.Pool(count, _init, (conf.export(), shared))
+    try:
+        if limit:
+            pending = deque()
+            for item in items:
+                if len(pending) >= limit:
+                    yield pending.popleft().get()
+                pending.append(pool.apply_async(func, (item,)))
+            while pending:
+                yield pending.popleft().get()
+        else:
+            chunksize = max(1, len(items) // (count * 4))
+            for result in pool.imap(func, items, chunksize):
+                yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def threads(func, items, count=None):
+    """Applies a function to each item using a bounded pool of threads,
+    and returns a list of results in the original order. Suitable for
+    I/O-bound work like running external commands."""
+    items = list(items)
+    count = min(count or jobs(), len(items))
+    if count < 2:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(count) as executor:
+        return list(executor.map(func, items))
+
+
+def _init(conf_state, shared):
+    """Worker process initializer."""
+    global _shared
+    conf.restore(conf_state)
+    _shared = shared
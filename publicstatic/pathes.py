@@ -42,6 +42,11 @@ def data(*suffix):
     return site(const.DATA_DIR, *suffix)
 
 
+def cache(*suffix):
+    """Absolute path to persistent build data inside site source directory."""
+    return site(const.CACHE_DIR, *suffix)
+
+
 def templates(*suffix):
     """Absolute path to templates inside site source directory."""
     return site(const.TEMPLATES_DIR, *suffix)
@@ -11,16 +11,24 @@ import shutil
 import socketserver
 import subprocess
 import threading
+import time
 import traceback
 import webbrowser
 from publicstatic import conf
 from publicstatic import const
 from publicstatic import builders
+from publicstatic import deps
 from publicstatic import logger
 from publicstatic import helpers
+from publicstatic import manifest
+from publicstatic import markdown
+from publicstatic import minify
+from publicstatic import output
 from publicstatic import pathes
 from publicstatic import source
+from publicstatic import templates
 from publicstatic.cache import Cache
+from publicstatic.watcher import Watcher
 
 
 def init(path=None, force=False):
@@ -40,19 +48,188 @@ def init(path=None, force=False):
         print(str(ex))
 
 
-def build(path=None, output=None):
+def build(path=None, output=None, jobs=None):
     """Generate web content from source."""
-    conf.load(path)
+    _configure(path, output, jobs)
+    manifest.load()
+    _build(Cache(), builders.order())
+    manifest.save()
+    _prune_caches()
+
+
+def watch(path=None, output=None, jobs=None):
+    """Generate web content and keep regenerating it on source changes."""
+    _configure(path, output, jobs)
+    manifest.load()
     cache = Cache()
-    if cache.processing_errors():
-        for file_name, error in cache.processing_errors():
-            message = "error processing source file '%s' - %s"
-            logger.error(message % (file_name, error))
+    _build(cache, builders.order())
+    manifest.save()
+    _prune_caches()
+
+    watcher = Watcher([
+        conf.path(),
+        pathes.theme_assets(),
+        pathes.assets(),
+        pathes.pages(),
+        pathes.posts(),
+        pathes.data(),
+        pathes.templates(),
+        pathes.theme_templates(),
+    ], conf.get('ignore'))
+
+    logger.info('watching for changes (use Ctrl-C to stop)...')
+    try:
+        while True:
+            time.sleep(conf.get('watch_interval'))
+            changed = watcher.changes()
+            if changed:
+                started = time.time()
+                cache = _rebuild(cache, changed, path, output, jobs)
+                _prune_caches()
+                logger.info("done in %.2f s" % (time.time() - started))
+    except KeyboardInterrupt:
+        logger.info('stopped')
+
+
+def cache_clear(path=None):
+    """Delete persistent build cache data."""
+    conf.load(path)
+    for name, disk_cache in _disk_caches():
+        logger.info("clearing %s cache: %s" % (name, disk_cache.path()))
+        disk_cache.clear()
+    logger.info('done')
+
+
+def cache_stats(path=None):
+    """Print persistent build cache usage statistics."""
+    conf.load(path)
+    for name, disk_cache in _disk_caches():
+        count, size = disk_cache.stats()
+        print("%s: %d entries, %.1f of %.1f MB used (%s)" % (
+            name, count, size / 1048576.0, disk_cache.max_size() / 1048576.0,
+            disk_cache.path()))
+
+
+def templates_compile(path=None):
+    """Precompile site and theme templates to the bytecode cache."""
+    conf.load(path)
+    errors = templates.compile_all()
+    for name, error in errors:
+        logger.warn("error compiling template '%s': %s" % (name, error))
+    count = len(templates.names()) - len(errors)
+    logger.info("%d templates compiled" % count)
+
+
+def _disk_caches():
+    """Named persistent caches."""
+    return [
+        ('markdown', markdown.cache()),
+        ('templates', templates.cache()),
+        ('minify', minify.cache()),
+    ]
+
+
+def _prune_caches():
+    for name, disk_cache in _disk_caches():
+        disk_cache.prune()
+
+
+def _configure(path, output, jobs):
+    conf.load(path)
     if output:
         conf.set('build_path', output)
+    if jobs is not None:
+        conf.set('jobs', jobs)
+
+
+def _build(cache, builders_list):
+    """Run builders reporting source processing errors first."""
+    for file_name, error in cache.processing_errors():
+        message = "error processing source file '%s' - %s"
+        logger.error(message % (file_name, error))
     logger.info('build directory: ' + conf.get('build_path'))
-    for builder in builders.order():
-        builder(cache)
+    builders.reset()
+    output.reset()
+    output.start(conf.get('write_threads'))
+    try:
+        for builder in builders_list:
+            builder(cache)
+    finally:
+        failed = output.stop()
+    # sources with failed outputs should be rebuilt next time
+    manifest.discard(os.path.relpath(path, conf.get('build_path'))
+                     for path in failed)
+    changed, unchanged = output.counts()
+    logger.info("output files: %d changed, %d unchanged" % (changed, unchanged))
+
+
+def _rebuild(cache, changed, path, output, jobs):
+    """Update cache with the changed files and run affected builders.
+    Returns the cache to be used for the next rebuild."""
+    for file_name in sorted(changed):
+        logger.info('changed: ' + file_name)
+
+    if conf.path() in changed:
+        logger.info('configuration changed, rebuilding everything')
+        _configure(path, output, jobs)
+        templates.reset()
+        markdown.reset()
+        minify.reset()
+        manifest.load()
+        cache = Cache()
+        _build(cache, builders.order())
+        manifest.save()
+        return cache
+
+    manifest.reset()
+    keys = set()  # dependencies of the content generated while parsing
+    data_changed = False
+    for file_name in changed:
+        for dir_path in [pathes.templates(), pathes.theme_templates()]:
+            if helpers.within(file_name, dir_path):
+                name = os.path.relpath(file_name, dir_path)
+                keys.add(deps.key(deps.TEMPLATE, name.replace(os.sep, '/')))
+        if helpers.within(file_name, pathes.data()):
+            keys.add(deps.key(deps.FILE, file_name))
+            data_changed = True
+
+    templates_changed = any(deps.parse(key)[0] == deps.TEMPLATE
+                            for key in keys)
+    if templates_changed:
+        templates.reset()
+
+    # sources embedding modified data files or templates should be parsed
+    # again; other changes are tracked by the build manifest
+    for key in keys:
+        changed = changed.union(item.path() for item in cache.dependents(key))
+
+    deleted = [item for item in cache.assets()
+               if item.path() in changed and not os.path.isfile(item.path())]
+    affected = cache.refresh(changed)
+    _remove_outputs(cache, deleted)
+    builders_list = []
+    if source.AssetSource in affected:
+        builders_list += builders.asset_builders()
+    content_changed = bool(affected - set([source.AssetSource])) or \
+        templates_changed or data_changed
+    if content_changed:
+        builders_list += builders.content_builders()
+    _build(cache, builders_list)
+    manifest.save(prune=content_changed)
+    return cache
+
+
+def _remove_outputs(cache, deleted):
+    """Remove output files of deleted assets. If the output is produced
+    by another asset too (e.g. a site asset overriding a theme one was
+    deleted), that asset is processed again instead."""
+    for item in deleted:
+        others = cache.assets(dest=item.rel_dest())
+        for other in others:
+            other.processed(False)
+        if not others and os.path.isfile(item.dest()):
+            logger.info('removing obsolete output: ' + item.rel_dest())
+            os.remove(item.dest())
 
 
 def _serve(path, port):
@@ -0,0 +1,71 @@
+# coding: utf-8
+
+"""Source files discovery."""
+
+import fnmatch
+import os
+from publicstatic import helpers
+
+try:
+    from os import scandir
+except ImportError:  # Python < 3.5
+    from scandir import scandir
+
+
+class Entry():
+    """Discovered file with the stat result obtained while scanning."""
+
+    __slots__ = ['path', 'rel_path', 'stat']
+
+    def __init__(self, path, rel_path, stat):
+        self.path = path
+        self.rel_path = rel_path
+        self.stat = stat
+
+
+def scan(root, patterns=None):
+    """Yields an Entry for each file in the root directory and its
+    subdirectories (in os.walk() order). Directories with names starting
+    with underscore and files or directories matching any of the ignore
+    @patterns are skipped. Files deleted while scanning are skipped too."""
+    patterns = patterns or []
+    dirs = [('', root)]
+    while dirs:
+        rel_dir, dir_path = dirs.pop()
+        subdirs = []
+        try:
+            items = list(scandir(dir_path))
+        except OSError:
+            continue
+        for item in items:
+            rel_path = os.path.join(rel_dir, item.name)
+            try:
+                if item.is_dir():
+                    if not item.is_symlink() and helpers.visible(item.name) \
+                            and not _match(item.name, rel_path, patterns):
+                        subdirs.append((rel_path, item.path))
+                elif not _match(item.name, rel_path, patterns):
+                    yield Entry(item.path, rel_path, item.stat())
+            except OSError:
+                pass
+        dirs.extend(reversed(subdirs))
+
+
+def ignored(rel_path, patterns=None):
+    """Returns True if a file with the specified path relative to the
+    source root directory would be skipped by scan()."""
+    if helpers.hidden(rel_path):
+        return True
+    parts = rel_path.split(os.sep)
+    for num, name in enumerate(parts, start=1):
+        if _match(name, os.sep.join(parts[:num]), patterns or []):
+            return True
+    return False
+
+
+def _match(name, rel_path, patterns):
+    """Check file or directory name, and relative path against the ignore
+    patterns (paths use forward slashes)."""
+    rel_path = rel_path.replace(os.sep, '/')
+    return any(fnmatch.fnmatch(name, pattern) or
+               fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
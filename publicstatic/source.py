@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 from publicstatic import conf
 from publicstatic import const
+from publicstatic import deps
 from publicstatic import helpers
 from publicstatic import errors
 from publicstatic import pathes
@@ -31,21 +32,95 @@ class PageExistsException(errors.BasicException):
     pass
 
 
+class SourceData(dict):
+    """Page data dictionary. Markdown content is converted to HTML on the
+    first 'content' item access, so page metadata could be used without
+    content conversion."""
+
+    def __init__(self, source, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._source = source
+
+    def __missing__(self, key):
+        if key == 'content':
+            return self._source.content()
+        raise KeyError(key)
+
+
+class IndexEntry:
+    """Compact site index record for listing pages. Holds the fields
+    most listings use; content and other page data (e.g. description)
+    are taken from the source on demand."""
+
+    __slots__ = ['_source', 'title', 'url', 'rel_url', 'created', 'updated',
+                 'tags']
+
+    def __init__(self, source):
+        self._source = source
+        data = source.data()
+        for field in IndexEntry.__slots__[1:]:
+            setattr(self, field, data[field])
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._source.data()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in IndexEntry.__slots__ or key in self._source.data()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
 class Source:
     """Basic abstraction used for static files to be copied w/o processing."""
-    def __init__(self, file_name, base_dir):
+
+    __slots__ = ['_path', '_rel_path', '_ext', '_ctime', '_utime',
+                 '_processed', '_listener']
+
+    def __init__(self, file_name, base_dir, stat=None):
         """Initialize Source object.
 
         Arguments:
         @file_name - path to a source file name, relative to base_dir.
-        @base_dir - root directory for source files of this kind."""
+        @base_dir - root directory for source files of this kind.
+        @stat - optional os.stat() result for the file, if already known."""
 
         self._path = os.path.join(base_dir, file_name)
         self._rel_path = os.path.relpath(file_name, base_dir)
         self._ext = os.path.splitext(file_name)[1].lower()
-        self._ctime = datetime.fromtimestamp(os.path.getctime(self._path))
-        self._utime = datetime.fromtimestamp(os.path.getmtime(self._path))
+        stat = stat or os.stat(self._path)
+        self._ctime = datetime.fromtimestamp(stat.st_ctime)
+        self._utime = datetime.fromtimestamp(stat.st_mtime)
         self._processed = False
+        self._listener = None
+
+    def __getstate__(self):
+        """Listener is not pickled to pass sources to worker processes."""
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', []):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state['_listener'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __str__(self):
         """Human-readable string representation."""
@@ -102,10 +177,17 @@ class Source:
 
     def processed(self, value=None):
         """Get/set 'processed' flag for the file."""
-        if type(value) == bool:
+        if type(value) == bool and value != self._processed:
             self._processed = value
+            if self._listener is not None:
+                self._listener(self)
         return self._processed
 
+    def listen(self, listener):
+        """Set a function to be called with the source object after
+        'processed' flag change (used to keep cache indexes updated)."""
+        self._listener = listener
+
 
 class ParseableSource(Source):
     """Basic abstraction for parseable source files."""
@@ -113,8 +195,12 @@ class ParseableSource(Source):
     # parse '<key>: <value>' string to (str, str) tuple
     _re_param = re.compile(r"^\s*([\w\d_-]+)\s*[:=]{1}(.*)", re.U)
 
-    def __init__(self, file_name, base_dir):
-        super().__init__(file_name, base_dir)
+    __slots__ = ['_deps', '_data', '_tag_names', '_body', '_text_digest',
+                 '_index_entry']
+
+    def __init__(self, file_name, base_dir, stat=None):
+        super().__init__(file_name, base_dir, stat)
+        self._deps = None  # set after content conversion
         self._data = self._parse()
         self._tag_names = list([tag['name'] for tag in self._data['tags']])
 
@@ -127,14 +213,71 @@ class ParseableSource(Source):
         if 'url' not in self._data:
             self._data['url'] = self.url(full=True)
             self._data['rel_url'] = self.url(full=False)
+        if key == 'content':
+            return self.content()
         return self._data.get(key, default) if key else self._data
 
+    def index_entry(self):
+        """Returns site index record for the page."""
+        if not hasattr(self, '_index_entry'):
+            self._index_entry = IndexEntry(self)
+        return self._index_entry
+
+    def content(self):
+        """Page content converted from markdown to HTML on first access.
+        In streaming mode it is not kept in memory, and is converted again
+        on each access (reusing cached markdown conversion results)."""
+        if 'content' in self._data:
+            return self._data['content']
+        with deps.collect() as found:
+            content = md(self.body().strip())
+        self._deps = found
+        if not conf.get('streaming'):
+            self._data['content'] = content
+        return content
+
+    def body(self):
+        """Page content source (without header). In streaming mode it is
+        not kept in memory, and the file is read again."""
+        if hasattr(self, '_body'):
+            return self._body
+        return ParseableSource._split(self.text())[2]
+
+    def content_state(self, with_content=True):
+        """Returns converted content with its dependencies to be transferred
+        from a worker process, or None if content was not converted.
+        Content itself could be omitted to transfer dependencies only."""
+        if self._deps is not None:
+            content = self._data.get('content') if with_content else None
+            return content, self._deps
+
+    def release_content(self):
+        """Forget converted content to free memory."""
+        self._data.pop('content', None)
+
+    def restore_content(self, state):
+        """Restores content converted by another instance of the source
+        (see content_state())."""
+        if state is not None:
+            content, self._deps = state
+            if content is not None:
+                self._data['content'] = content
+
     def text(self):
-        """Source file contents."""
-        if not hasattr(self, '_text'):
-            with codecs.open(self._path, 'r', encoding='utf-8') as f:
-                self._text = f.read()
-        return self._text
+        """Source file contents (read from the file on each call)."""
+        with codecs.open(self._path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def digest(self):
+        """Returns a hash of the source text and page data, except
+        the rendered content."""
+        meta = {k: v for k, v in self.data().items() if k != 'content'}
+        return helpers.digest(self._text_digest, meta)
+
+    def dependencies(self):
+        """Dependencies (see deps module) recorded while converting the
+        content, like the data files embedded to the page."""
+        return self._deps or set()
 
     def created(self):
         return self._data.get('created')
@@ -163,9 +306,15 @@ class ParseableSource(Source):
         return tag in self._tag_names
 
     def _parse(self):
-        """Extract page header data and content from a list of lines
-        and return the result as key-value couples."""
-        meta, desc, content = ParseableSource._split(self.text())
+        """Extract page header data from a list of lines and return the
+        result as key-value couples. Content is stored to be converted
+        on demand."""
+        text = self.text()
+        self._text_digest = helpers.digest(text)
+        meta, desc, content = ParseableSource._split(text)
+        if not conf.get('streaming'):
+            self._body = content
+        meta = SourceData(self, meta)
         meta.update({
             'source': self._path,
             'title': meta.get('title', helpers.get_h1(content)),
@@ -179,7 +328,6 @@ class ParseableSource(Source):
             'created': helpers.parse_time(meta.get('created'), self._ctime),
             'updated': helpers.parse_time(meta.get('updated'), self._utime),
             'description': meta.get('description', desc),
-            'content': md(content.strip()),
         })
         return meta
 
@@ -239,12 +387,16 @@ class ParseableSource(Source):
 
 
 class AssetSource(Source):
+    __slots__ = []
+
     def rel_dest(self):
         ext = '.css' if self.ext() == '.less' else self.ext()
         return os.path.splitext(self._rel_path)[0] + ext
 
 
 class PageSource(ParseableSource):
+    __slots__ = []
+
     def rel_dest(self):
         ext = '.html' if self.ext() in ['.md', '.markdown'] else self.ext()
         return os.path.splitext(self._rel_path)[0] + ext
@@ -274,6 +426,8 @@ class PageSource(ParseableSource):
 
 
 class PostSource(ParseableSource):
+    __slots__ = []
+
     def rel_dest(self):
         name = os.path.basename(self._rel_path).lstrip('0123456789-_')
         name = os.path.splitext(name)[0]
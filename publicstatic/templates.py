@@ -4,17 +4,31 @@
 
 import codecs
 import jinja2
+import jinja2.meta
 import os.path
 from urllib.parse import urlparse
 import yaml
+from publicstatic import bundler
 from publicstatic import conf
 from publicstatic import const
+from publicstatic import deps
+from publicstatic import diskcache
 from publicstatic import logger
 from publicstatic import helpers
 from publicstatic import minify
+from publicstatic import output
 from publicstatic import pathes
 
 _env = None
+_refs = {}  # template name -> names of all templates it depends on
+_layouts = {}  # base template name -> compiled page layout
+
+CACHE_DIR = 'templates'
+CACHE_SIZE = 16 * 1024 * 1024  # bytecode cache size limit in bytes
+
+# template file extensions (other files in templates directories,
+# like README.md, are not templates)
+TEMPLATE_EXTENSIONS = ['html', 'xml']
 
 JINJA_EXTENSIONS = [
     'jinja2.ext.loopcontrols',
@@ -27,15 +41,89 @@ def env():
         search_pathes = [pathes.templates(), pathes.theme_templates()]
         logger.info("templates pathes: [%s]" % ', '.join(search_pathes))
         loader = jinja2.FileSystemLoader(searchpath=search_pathes)
-        _env = jinja2.Environment(loader=loader, extensions=JINJA_EXTENSIONS)
+        cache_path = pathes.cache(CACHE_DIR)
+        helpers.makedirs(cache_path)
+        # cached bytecode is validated against template source checksum
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_path)
+        _env = jinja2.Environment(loader=loader,
+                                  extensions=JINJA_EXTENSIONS,
+                                  bytecode_cache=bytecode_cache)
         _env.filters.update(custom_filters())
         _env.globals.update(custom_globals())
     return _env
 
 
+def cache():
+    """Compiled templates storage (for maintenance operations)."""
+    return diskcache.DiskCache(pathes.cache(CACHE_DIR), CACHE_SIZE)
+
+
+def names():
+    """Returns names of all site and theme templates."""
+    return env().list_templates(extensions=TEMPLATE_EXTENSIONS)
+
+
+def compile_all():
+    """Compile all site and theme templates, storing bytecode to the
+    cache. Returns a list of (template name, error) for failed ones."""
+    errors = []
+    for name in names():
+        try:
+            env().get_template(name)
+        except jinja2.TemplateError as e:
+            errors.append((name, e))
+    return errors
+
+
+def digest(name):
+    """Returns a hash of the template file effectively used for the specified
+    template name, or None if there is no such template."""
+    try:
+        source, file_name, _ = env().loader.get_source(env(), name)
+    except jinja2.exceptions.TemplateNotFound:
+        return None
+    return helpers.digest(file_name, source)
+
+
+def references(name):
+    """Returns a set of template names including the specified one,
+    and all templates it uses via extends, include, import and from
+    statements, directly or indirectly."""
+    if name not in _refs:
+        result = set([name])
+        _refs[name] = result  # guards against circular references
+        try:
+            source = env().loader.get_source(env(), name)[0]
+        except jinja2.exceptions.TemplateNotFound:
+            return result
+        for ref in jinja2.meta.find_referenced_templates(env().parse(source)):
+            if ref is None:  # dynamic reference, could be any template
+                result.update(names())
+            else:
+                result.update(references(ref))
+    return _refs[name]
+
+
+def reset():
+    """Drop the environment with its cached templates, compiled layouts
+    and template references found before (to be called after template
+    or configuration changes)."""
+    global _env
+    _env = None
+    _refs.clear()
+    _layouts.clear()
+
+
+def _depend(name):
+    """Record dependency on the template and templates it uses."""
+    for ref in references(name):
+        deps.template(ref)
+
+
 def custom_globals():
     return {
         'asset_exists': asset_exists,
+        'bundle': bundler.url,
     }
 
 
@@ -70,46 +158,63 @@ def filter_trimurl(value):
 
 def render(data, template, dest_path):
     """Render data using a specified template to a file."""
-    result = env().get_template(template).render(data)
-    _save(result, dest_path)
+    _depend(template)
+    _save(env().get_template(template), data, dest_path)
 
 
 def render_file(path, data, dest_path):
     """Read template from a file, and render it to the destination path."""
     with codecs.open(path, mode='r', encoding='utf-8') as f:
         template = env().from_string(f.read())
-    _save(template.render(data), dest_path)
+    _save(template, data, dest_path)
 
 
 def render_page(page_data, dest_path):
-    """This one is tricky. It creates a dynamic template inherited from
-    the base template, adds a 'main' block to this template with page content
-    inside, and renders the result template to [dest_path]. Boom!"""
+    """Renders page content using the layout template specified in page
+    data. Content is passed to the 'main' block of the layout as is,
+    without being processed as a template."""
     base_template = page_data['page']['template'] + '.html'
-    content = page_data['page']['content']
-    template = """{%% extends "%s" %%}{%% block main %%}%s{%% endblock %%}"""
-    template = template % (base_template, content)
+    _depend(base_template)
     try:
-        template = env().from_string(template)
-        html = template.render(page_data)
-        _save(html, dest_path)
+        _save(layout(base_template), page_data, dest_path)
     except jinja2.exceptions.TemplateNotFound as e:
         message = "page generation failed because template was not found: %s"
         logger.error(message % e)
 
 
+def layout(base_template):
+    """Returns a compiled template inherited from the base template, with
+    a 'main' block showing page content. Each layout is compiled once."""
+    if base_template not in _layouts:
+        template = """{%% extends "%s" %%}""" \
+                   """{%% block main %%}{{ page.content }}{%% endblock %%}"""
+        _layouts[base_template] = env().from_string(template % base_template)
+    return _layouts[base_template]
+
+
 def render_data(data_file, template):
     data_file = pathes.data(data_file)
+    deps.file(data_file)
     with codecs.open(data_file, mode='r', encoding='utf-8') as f:
         data = yaml.load(f)
     template_file = "_data_%s.html" % template
+    _depend(template_file)
     result = env().get_template(template_file).render({'data': data})
     return result
 
 
-def _save(text, dest_path):
-    """Apply optional HTML minification to the [text] and save it to file."""
-    if conf.get('min_html') and helpers.ext(dest_path) == '.html':
-        text = minify.minify_html(text)
-    with codecs.open(dest_path, mode='w', encoding='utf-8') as f:
-        f.write(text)
+def _save(template, data, dest_path):
+    """Render the template, apply optional HTML minification to the result
+    and save it to file. In streaming mode output is written in chunks
+    as the template generates it, without building the whole page text."""
+    minify_html = conf.get('min_html') and helpers.ext(dest_path) == '.html'
+    if conf.get('streaming'):
+        chunks = template.generate(data)
+        if minify_html:
+            chunks = minify.minify_html_stream(chunks)
+        output.write_chunks(dest_path, chunks)
+    else:
+        text = template.render(data)
+        if minify_html:
+            text = minify.cached_minify_html(text)
+        output.write(dest_path, text)
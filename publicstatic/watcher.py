@@ -0,0 +1,45 @@
+# coding: utf-8
+
+"""File system changes detection."""
+
+import os
+from publicstatic import scanner
+
+
+class Watcher():
+    """Polls a set of directories and files for changes."""
+
+    def __init__(self, pathes, patterns=None):
+        """Take initial snapshot of the specified directories and files.
+        Files matching the ignore @patterns are not tracked."""
+        self._pathes = pathes
+        self._patterns = patterns
+        self._state = self._snapshot()
+
+    def changes(self):
+        """Returns a set of full file names created, modified or deleted
+        since the previous call."""
+        state = self._snapshot()
+        changed = set(state.keys()) ^ set(self._state.keys())
+        for file_name, stat in state.items():
+            if file_name in self._state and self._state[file_name] != stat:
+                changed.add(file_name)
+        self._state = state
+        return changed
+
+    def _snapshot(self):
+        """Returns a dictionary of modification time and size values
+        for each file."""
+        state = {}
+        for path in self._pathes:
+            if os.path.isdir(path):
+                for entry in scanner.scan(path, self._patterns):
+                    state[entry.path] = (entry.stat.st_mtime,
+                                         entry.stat.st_size)
+            elif os.path.isfile(path):
+                try:
+                    stat = os.stat(path)
+                    state[path] = (stat.st_mtime, stat.st_size)
+                except OSError:  # file was deleted while checking
+                    pass
+        return state
@@ -47,12 +47,12 @@ setup(
     platforms=['any'],
     packages=find_packages(),
     install_requires=[
-        'beautifulsoup4',
         'jinja2',
         'markdown >= 2.4',
         'mdx_grid',
         'pygments',
         'pyyaml',
+        'scandir; python_version < "3.5"',
         'yuicompressor',
     ],
     entry_points={
@@ -0,0 +1,48 @@
+# encoding: utf-8
+
+from publicstatic import bundler
+
+
+test_assets = {
+    'css/main.css': """@charset "utf-8";
+@import url("//fonts.example.com/font.css");
+@import "parts/header.css" screen;
+/* @import "ignored.css"; */
+body { background: url(img/bg.png); }
+a::after { content: "url(img/bg.png)"; }
+""",
+    'css/parts/header.css': """@import url('../main.css');
+header { background: url("../../img/logo.png?v=1"); }
+h1 { background: url(data:image/png;base64,AAAA); }
+""",
+    'js/a.js': "var a = 1\n",
+    'js/b.js': "(function () {})();\n",
+}
+
+
+def test_concat_css():
+    result = bundler.concat_css(['css/main.css'], 'bundles',
+                                test_assets.get)
+    assert result == """@import url("//fonts.example.com/font.css");
+@media screen{
+header { background: url("../img/logo.png?v=1"); }
+h1 { background: url(data:image/png;base64,AAAA); }
+}
+/* @import "ignored.css"; */
+body { background: url(../css/img/bg.png); }
+a::after { content: "url(img/bg.png)"; }
+"""
+
+
+def test_concat_js():
+    result = bundler.concat_js(['js/a.js', 'js/b.js'], test_assets.get)
+    assert result == "var a = 1\n;\n(function () {})();"
+
+
+def main():
+    test_concat_css()
+    test_concat_js()
+
+
+if __name__ == '__main__':
+    main()
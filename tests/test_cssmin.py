@@ -0,0 +1,63 @@
+# encoding: utf-8
+
+from publicstatic import cssmin
+
+
+test_css = """
+/* Header styles */
+@import url("base.css") screen , print;
+
+body > .content  +  p,
+h1 ~ h2 {
+    margin : 0px 0.0em 10px -0px;
+    color: #FFFFFF ;
+    background: url( "images/bg 0px.png" ) #aabbcd;
+    font: 12px / 1.5 "Helvetica  Neue", sans-serif !important;;
+}
+
+/*! License comment */
+@media screen and ( max-width : 600px ) {
+    #a0a0a0 a:hover, div :first-child { width: calc(100% - 10px); }
+    .empty { ; }
+}
+
+a::after { content: "  /* not a comment */  "; padding: 0.5em 0 0px; }
+"""
+
+test_result = ('@import url("base.css") screen,print;'
+               'body>.content+p,h1~h2{margin:0 0 10px 0;color:#FFF;'
+               'background:url("images/bg 0px.png") #aabbcd;'
+               'font:12px/1.5 "Helvetica  Neue",sans-serif!important}'
+               '/*! License comment */'
+               '@media screen and (max-width:600px){'
+               '#a0a0a0 a:hover,div :first-child{width:calc(100% - 10px)}'
+               '.empty{}}'
+               'a::after{content:"  /* not a comment */  ";padding:0.5em 0 0}')
+
+
+def test_minify():
+    assert cssmin.minify_css(test_css) == test_result
+
+
+def test_keyframes():
+    css = "@keyframes fade { from { opacity: 0 } 50% { top: 0px } }"
+    assert cssmin.minify_css(css) == \
+        "@keyframes fade{from{opacity:0}50%{top:0}}"
+
+
+def test_zero_units():
+    css = ("a { width: calc(0px + 10%); height: max(0em, min(1em, 0px));"
+           " margin: 0px; --x: 0px; padding: var(--x, 0px) }")
+    assert cssmin.minify_css(css) == \
+        "a{width:calc(0px + 10%);height:max(0em,min(1em,0px));margin:0;" \
+        "--x:0px;padding:var(--x,0)}"
+
+
+def main():
+    test_minify()
+    test_keyframes()
+    test_zero_units()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import time
+from publicstatic.diskcache import DiskCache
+
+
+def test_put_get():
+    path = tempfile.mkdtemp()
+    try:
+        cache = DiskCache(path, 1024)
+        assert cache.get('abcdef') is None
+        cache.put('abcdef', 'value\r\nwith newlines\n')
+        assert cache.get('abcdef') == 'value\r\nwith newlines\n'
+        assert cache.stats()[0] == 1
+        cache.clear()
+        assert cache.get('abcdef') is None
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def test_prune():
+    path = tempfile.mkdtemp()
+    try:
+        cache = DiskCache(path, 25)
+        for num, key in enumerate(['aa01', 'aa02', 'aa03']):
+            cache.put(key, '0123456789')
+            past = time.time() - 100 + num
+            os.utime(cache.path(key), (past, past))
+        cache.get('aa01')  # the oldest entry becomes the most recently used
+        cache.prune()
+        assert cache.stats() == (2, 20)
+        assert cache.get('aa01') is not None
+        assert cache.get('aa02') is None
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    test_put_get()
+    test_prune()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,8 +16,18 @@ def test_md():
     assert helpers.get_h1(test_data) == title
 
 
+def test_run_batch():
+    pairs = [('a b.js', 'a.min.js'), ('c.js', 'c.min.js')]
+    code, stdout, _ = helpers.run_batch('echo {pairs}', pairs)
+    assert code == 0
+    assert stdout.strip() == 'a b.js a.min.js c.js c.min.js'
+    code, stdout, _ = helpers.run_batch('echo {sources} : {dests}', pairs)
+    assert stdout.strip() == 'a b.js c.js : a.min.js c.min.js'
+
+
 def main():
     test_md()
+    test_run_batch()
 
 
 if __name__ == '__main__':
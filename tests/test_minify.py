@@ -1,8 +1,5 @@
 # encoding: utf-8
 
-import bs4
-import re
-from html.parser import HTMLParser
 from publicstatic import minify
 
 
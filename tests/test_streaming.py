@@ -0,0 +1,31 @@
+# encoding: utf-8
+
+from publicstatic import builders
+from publicstatic import pathes
+from publicstatic import publicstatic
+from publicstatic.cache import Cache
+from testsite import temp_site
+
+
+def test_content_released():
+    with temp_site(streaming=True):
+        for num in range(5):
+            file_name = pathes.posts("2015010%d-post%d.md" % (num, num))
+            with open(file_name, mode='w', encoding='utf-8') as f:
+                f.write("title: Post %d\n\nContent of post %d" % (num, num))
+        cache = Cache()
+        publicstatic._build(cache, builders.order())
+        sources = list(cache.posts()) + list(cache.pages())
+        assert len(sources) == 7
+        for item in sources:
+            assert 'content' not in item.data()
+            with open(item.dest(), encoding='utf-8') as f:
+                assert item.data('title') in f.read()
+
+
+def main():
+    test_content_released()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# encoding: utf-8
+
+import os
+from publicstatic import builders
+from publicstatic import manifest
+from publicstatic import pathes
+from publicstatic import publicstatic
+from publicstatic.cache import Cache
+from testsite import temp_site
+
+
+def test_template_override():
+    with temp_site() as path:
+        cache = Cache()
+        publicstatic._build(cache, builders.order())
+        manifest.save()
+        dest = cache.posts()[0].dest()
+        with open(dest, encoding='utf-8') as f:
+            assert 'OVERRIDE' not in f.read()
+
+        # site template overriding the theme one is added during watch
+        template = pathes.templates('post.html')
+        with open(template, mode='w', encoding='utf-8') as f:
+            f.write('OVERRIDE {{ page.title }}')
+        publicstatic._rebuild(cache, set([template]), path, None, None)
+        with open(dest, encoding='utf-8') as f:
+            assert f.read().startswith('OVERRIDE')
+
+
+def test_data_change_after_build():
+    with temp_site() as path:
+        data_file = pathes.data('team.yml')
+        os.makedirs(pathes.data())
+        with open(data_file, mode='w', encoding='utf-8') as f:
+            f.write('Alice')
+        with open(pathes.pages('team.md'), mode='w', encoding='utf-8') as f:
+            f.write('title: Team\n\n--- data: team.yml, team\n')
+        publicstatic._build(Cache(), builders.order())
+        manifest.save()
+
+        # watch is started after the build, so pages are not converted
+        manifest.load()
+        cache = Cache()
+        publicstatic._build(cache, builders.order())
+        manifest.save()
+        with open(data_file, mode='w', encoding='utf-8') as f:
+            f.write('Bob')
+        publicstatic._rebuild(cache, set([data_file]), path, None, None)
+        with open(cache.pages(dest='team.html')[0].dest(), encoding='utf-8') as f:
+            assert 'Bob' in f.read()
+
+
+def test_asset_removal():
+    with temp_site() as path:
+        asset = pathes.assets('extra.txt')
+        with open(asset, mode='w', encoding='utf-8') as f:
+            f.write('extra')
+        cache = Cache()
+        publicstatic._build(cache, builders.order())
+        manifest.save()
+        dest = os.path.join(path, 'build', 'extra.txt')
+        assert os.path.isfile(dest)
+        os.remove(asset)
+        publicstatic._rebuild(cache, set([asset]), path, None, None)
+        assert not os.path.isfile(dest)
+
+
+def main():
+    test_template_override()
+    test_data_change_after_build()
+    test_asset_removal()
+
+
+if __name__ == '__main__':
+    main()
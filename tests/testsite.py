@@ -0,0 +1,56 @@
+# encoding: utf-8
+
+"""Temporary website for the tests building a site."""
+
+import contextlib
+import os
+import shutil
+import tempfile
+from publicstatic import conf
+from publicstatic import data
+from publicstatic import deps
+from publicstatic import helpers
+from publicstatic import manifest
+from publicstatic import markdown
+from publicstatic import pathes
+from publicstatic import templates
+
+
+class PlainText():
+    """Markdown engine keeping the text as is (the tests do not depend
+    on markdown extensions). Data file lines are replaced with the file
+    contents, as the data extension does."""
+
+    def convert(self, text):
+        lines = []
+        for line in text.splitlines():
+            if line.startswith(data.PREFIX):
+                file_name = pathes.data(line[len(data.PREFIX):].split(',')[0]
+                                        .strip())
+                deps.file(file_name)
+                with open(file_name, encoding='utf-8') as f:
+                    line = f.read()
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def temp_site(**params):
+    """Create a website from the prototype in a temporary directory, with
+    the specified configuration parameters. Yields the site path."""
+    path = tempfile.mkdtemp()
+    try:
+        conf.generate(path, force=True)
+        helpers.copydir(pathes.proto(), pathes.site(), force=True)
+        conf.set('build_path', os.path.join(path, 'build'))
+        conf.set('md_engine', __name__ + '.PlainText')
+        for param, value in params.items():
+            conf.set(param, value)
+        markdown.reset()
+        templates.reset()
+        manifest.load()
+        yield path
+    finally:
+        markdown.reset()
+        templates.reset()
+        shutil.rmtree(path)